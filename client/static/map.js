@@ -6,7 +6,7 @@ import { toLonLat, fromLonLat } from "ol/proj";
 import VectorSource from "ol/source/Vector";
 import VectorLayer from "ol/layer/Vector";
 import { Icon, Style } from "ol/style.js";
-import { StadiaMaps } from "ol/source";
+import { StadiaMaps, XYZ } from "ol/source";
 import TileLayer from "ol/layer/Tile";
 import {
   createEmpty as createEmptyBoundingBox,
@@ -94,7 +94,7 @@ function getMap({ view, target = "map", options = {} }) {
  */
 async function mapToImage(map, mapFormData) {
   let allCoordinates = [];
-  setMapSource(mapFormData.tileSrc, map);
+  setMapSource(mapFormData.tileSrc, map, mapFormData.tileUrl);
   mapFormData.locations.forEach((location) => {
     allCoordinates.push(JSON.parse(location.coordinates));
   });
@@ -133,7 +133,7 @@ function startAnimation(
   shouldPlayAudio = options.shouldPlayAudio ? true: false;
 
   let allCoordinates = [];
-  setMapSource(mapFormData.tileSrc, map);
+  setMapSource(mapFormData.tileSrc, map, mapFormData.tileUrl);
   mapFormData.locations.forEach((location) => {
     allCoordinates.push(JSON.parse(location.coordinates));
   });
@@ -364,7 +364,12 @@ function createLine(coordinates) {
 async function animateLine(map, lineString, lineFeature, mapFormData) {
   let index = 0;
   const totalSegments = lineString.getCoordinates().length - 1;
-  const segmentDuration = ANIMATION_DURATION;
+  // Precomputed by the server when rendering, see functions/app/utils/camera.py.
+  // Its keyframes are spread over its own segment duration, so play it back at that.
+  const cameraPath = mapFormData.cameraPath;
+  const segmentDuration = cameraPath
+    ? cameraPath.segmentDuration
+    : ANIMATION_DURATION;
   let segmentStart = null;
   let startCoords = lineString.getCoordinates()[0];
   let nextCoords = lineString.getCoordinates()[1];
@@ -376,14 +381,24 @@ async function animateLine(map, lineString, lineFeature, mapFormData) {
     source: sharedVectorSource,
   });
   animationInProgress = true;
-  shouldRecord && captureMapAnimation("canvas", 25, "mapAnimation.webm");
+  shouldRecord &&
+    captureMapAnimation(
+      "canvas",
+      cameraPath ? cameraPath.fps : 25,
+      "mapAnimation.webm"
+    );
 
   sharedVectorLayer.setZIndex(1000);
   sharedVectorSource.addFeature(temporaryPointFeature);
   map.addLayer(sharedVectorLayer);
 
   // zoomLevel = getZoomLevel(startCoords, nextCoords); //preparing to zoom in on first point
-  adjustZoomIfNecessary(map, startCoords, nextCoords);
+  adjustZoomIfNecessary(
+    map,
+    startCoords,
+    nextCoords,
+    cameraPath ? cameraPath.zooms[0] : null
+  );
   renderPoint(map, startCoords, true);
   const images = await getCurrentImages(index, mapFormData);
   // Calculate the delay between rendering each image so that all images are rendered within 5 seconds
@@ -424,18 +439,30 @@ async function animateLine(map, lineString, lineFeature, mapFormData) {
     const segmentEndCoords = lineString.getCoordinates()[index + 1];
     if (elapsed < segmentDuration) {
       const percentComplete = elapsed / segmentDuration;
-      const interpolatedCoord = [
-        segmentStartCoords[0] +
-          (segmentEndCoords[0] - segmentStartCoords[0]) * percentComplete,
-        segmentStartCoords[1] +
-          (segmentEndCoords[1] - segmentStartCoords[1]) * percentComplete,
-      ];
+      let interpolatedCoord;
+      let segmentCoordsSoFar;
+      if (cameraPath) {
+        segmentCoordsSoFar = getPlannedSegmentCoords(
+          cameraPath,
+          index,
+          percentComplete
+        );
+        interpolatedCoord = segmentCoordsSoFar[segmentCoordsSoFar.length - 1];
+      } else {
+        interpolatedCoord = [
+          segmentStartCoords[0] +
+            (segmentEndCoords[0] - segmentStartCoords[0]) * percentComplete,
+          segmentStartCoords[1] +
+            (segmentEndCoords[1] - segmentStartCoords[1]) * percentComplete,
+        ];
+        segmentCoordsSoFar = [interpolatedCoord];
+      }
       updatePointCoordinates(temporaryPointFeature, interpolatedCoord);
 
       // Include all previous segments plus the current interpolated coordinate
       const currentLineString = new LineString([
         ...coordsToRender,
-        interpolatedCoord,
+        ...segmentCoordsSoFar,
       ]);
       lineFeature.setGeometry(currentLineString);
       map.getView().animate({
@@ -446,7 +473,11 @@ async function animateLine(map, lineString, lineFeature, mapFormData) {
     } else {
       // Segment completed, prepare for the next segment
       renderPoint(map, segmentEndCoords);
-      coordsToRender.push(segmentEndCoords);
+      if (cameraPath) {
+        coordsToRender.push(...cameraPath.segments[index].slice(1));
+      } else {
+        coordsToRender.push(segmentEndCoords);
+      }
       segmentStart = null;
       index++; // this sets the index to the end coordinates
       const nextCoords =
@@ -472,7 +503,12 @@ async function animateLine(map, lineString, lineFeature, mapFormData) {
       }
 
       await sleep(totalDelay);
-      await adjustZoomIfNecessary(map, segmentEndCoords, nextCoords);
+      await adjustZoomIfNecessary(
+        map,
+        segmentEndCoords,
+        nextCoords,
+        cameraPath && nextCoords ? cameraPath.zooms[index] : null
+      );
       requestAnimationFrame(_animate);
     }
   }
@@ -480,6 +516,26 @@ async function animateLine(map, lineString, lineFeature, mapFormData) {
   requestAnimationFrame(_animate);
 }
 
+/**
+ * Plays back a segment of a camera path precomputed by the server.
+ *
+ * @param {Object} cameraPath - The plan, with `segments` holding the keyframe
+ *                              coordinates ('EPSG:3857') of every segment.
+ * @param {number} index - Index of the segment being animated.
+ * @param {number} percentComplete - How far along the segment the animation is, 0 to 1.
+ * @returns {Array} The keyframe coordinates of the segment after its start, up to and
+ *                  including the current one, which is where the camera should be.
+ */
+function getPlannedSegmentCoords(cameraPath, index, percentComplete) {
+  const frames = cameraPath.segments[index];
+  const frameIndex = Math.min(
+    frames.length - 1,
+    Math.floor(percentComplete * (frames.length - 1))
+  );
+  // The segment's start is already part of the rendered line.
+  return frameIndex > 0 ? frames.slice(1, frameIndex + 1) : [frames[0]];
+}
+
 /**
  * Asynchronously loads, resizes images from mapFormData, creating polaroids.
  *
@@ -576,9 +632,13 @@ function calculatePixelOffset(index) {
  * @param {Object} map - The map object whose style will be changed. This should be an
  *                      instance of an OpenLayers Map class.
  *
+ * @param {string} [tileUrl] - Optional XYZ tile URL template, e.g. `http://host/{z}/{x}/{y}.png`.
+ *                             Only set by the server when it renders against its own tile
+ *                             source, it takes precedence over `layer`.
+ *
  * @returns {void} This function does not return a value. It makes visual updates to the DOM
  */
-function setMapSource(layer, map) {
+function setMapSource(layer, map, tileUrl) {
   const sourceOptions = {
     stamen_toner: { layer: "stamen_toner", retina: true },
     stamen_watercolor: { layer: "stamen_watercolor", retina: false },
@@ -589,12 +649,14 @@ function setMapSource(layer, map) {
     // Add more sources as needed
   };
 
-  if (!sourceOptions.hasOwnProperty(layer)) {
+  if (!tileUrl && !sourceOptions.hasOwnProperty(layer)) {
     console.error(`Invalid layer key: ${layer}`);
     return;
   }
 
-  const newSource = new StadiaMaps(sourceOptions[layer]);
+  const newSource = tileUrl
+    ? new XYZ({ url: tileUrl })
+    : new StadiaMaps(sourceOptions[layer]);
   const firstLayer = map.getLayers().item(0);
   if (firstLayer) firstLayer.setSource(newSource);
   else {
@@ -674,10 +736,18 @@ function getZoomLevel(startCoords, nextCoords) {
  *
  * @param {number[]} startCoords - The starting coordinates
  * @param {number[]} endCoords - The ending coordinates,
+ * @param {number|null} [plannedZoomLevel=null] - Zoom level precomputed by the server. When given
+ *                                                it is used instead of calculating one.
  * @returns {Promise<void>} A promise that resolves when the zoom adjustment and animation are complete.
  */
-async function adjustZoomIfNecessary(map, startCoords, endCoords) {
-  const newZoomLevel = getZoomLevel(startCoords, endCoords);
+async function adjustZoomIfNecessary(
+  map,
+  startCoords,
+  endCoords,
+  plannedZoomLevel = null
+) {
+  const newZoomLevel =
+    plannedZoomLevel ?? getZoomLevel(startCoords, endCoords);
   if (newZoomLevel != zoomLevel) {
     zoomLevel = newZoomLevel;
     map.getView().animate({ zoom: zoomLevel, duration: 3000 });
@@ -1,14 +1,55 @@
-from flask import render_template, request, abort, jsonify, url_for
+import contextvars
+import logging
+import os
+import uuid
+from flask import render_template, request, abort, jsonify, url_for, g
 from http import HTTPStatus
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 
+from .utils.admission import AdmissionController, RenderRejected, estimate_render_cost
+from .utils.camera import plan_camera_path
 from .utils.flasklambda import FlaskLambda
+from .utils.journey import JourneyValidationError, parse_journey, parse_products
+from .utils.logs import RateLimitFilter, job_id, request_id, setup_logging
 from .utils.mapbox import get_geocoded_suggestions, get_n_random_suggestions
+from .utils.prints import PRODUCT_SPECS, derive_products
+from .utils.transcode import submit_animation
 
 
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
+# Animation loops can log every frame, so the page's console is rate limited.
+browser_logger = logging.getLogger(__name__ + ".browser")
+browser_logger.addFilter(RateLimitFilter())
+
 app = FlaskLambda(__name__)
+render_admission = AdmissionController()
+
+SCREENSHOT_VIEWPORT = {"width": 7200, "height": 5400}
+SCREENSHOT_NAME = "HEMLO.png"
+# Every render writes into its own directory under this one, named by its job id,
+# so renders admitted at the same time never share a file.
+RENDERS_DIR = os.environ.get("RENDERS_DIR", "./renders")
+# Renders use this XYZ tile URL template instead of the named tile source when set.
+TILE_URL = os.environ.get("TILE_URL")
+
+
+@app.before_request
+def tag_request():
+    if "lambda.event" in request.environ:
+        rid = os.environ.get("AWS_REQUEST_ID")
+    else:
+        rid = request.headers.get("X-Request-Id")
+    g.request_id_token = request_id.set(rid or uuid.uuid4().hex[:12])
+
+
+@app.teardown_request
+def untag_request(exc):
+    token = g.pop("request_id_token", None)
+    if token is not None:
+        request_id.reset(token)
 
 
 @app.route("/")
@@ -22,70 +63,162 @@ def map():
 
 
 def handle_dowload(download):
-    print(f"Download {download.suggested_filename} started")
+    logger.info("Download %s started", download.suggested_filename)
     # Wait for the download process to complete and save the downloaded file somewhere
     download.save_as("./" + download.suggested_filename)
 
 
-@app.post("/bg")
-def bg():
-    """
-    Captures an animation and generates a background image of a map using provided map form data.
-    This endpoint expects a JSON payload with map form data, which includes:
+def _report_print(name, future):
+    try:
+        logger.info("Print file for %s ready: %s", name, future.result())
+    except Exception as e:
+        logger.error("Print file for %s failed: %s", name, e)
 
-    - `locations`: Array of objects, each containing:
-      - `id`: Unique identifier for the location.
-      - `address`: Physical address.
-      - `arrival`: Arrival time at the location.
-      - `departure`: Departure time from the location.
-      - `coordinates`: Geographical coordinates as a string.
-      - `images`: Array of associated image files.
-    - `tileSrc`: URL for the map tile source.
 
-    Returns:
-        An empty response with a 200 OK status code if valid data received, else 400.
+def render_journey(journey, map_form_data, products=()):
     """
-    map_form_data = request.json
-    if not map_form_data["locations"]:
-        return "", HTTPStatus.BAD_REQUEST
+    Renders the still and captures the animation of a journey in headless Chromium.
+    The still is the master every product's print file is derived from, and the
+    WebM is handed to the transcode process pool once it's saved. Both are written
+    to the job's own directory under `RENDERS_DIR`, where the derived files end up too.
+    """
+    job = uuid.uuid4().hex[:12]
+    token = job_id.set(job)
+    try:
+        job_dir = os.path.abspath(os.path.join(RENDERS_DIR, job))
+        os.makedirs(job_dir)
+        _render_journey(journey, map_form_data, products, job_dir)
+    finally:
+        job_id.reset(token)
+
+
+def _render_journey(journey, map_form_data, products, job_dir):
+    # Playwright calls the console handlers from its own dispatcher, so the ids are
+    # bound here rather than read from the context when the message arrives.
+    ids = {"request_id": request_id.get(), "job_id": job_id.get()}
+
+    def log_console(msg):
+        browser_logger.info(msg.text, extra=ids)
 
-    print("Getting Screenshot")
+    screenshot_path = os.path.join(job_dir, SCREENSHOT_NAME)
+
+    logger.info("Getting Screenshot")
     with sync_playwright() as p:
         browser = p.chromium.launch()
-        context = browser.new_context(viewport={"width": 7200, "height": 5400})
+        context = browser.new_context(viewport=SCREENSHOT_VIEWPORT)
         page = context.new_page()
-        page.on("console", lambda msg: print(msg.text))
+        page.on("console", log_console)
 
         page.goto(url_for("map", _external=True))
         page.evaluate(
             "(mapFormData) => window.prepForScreenshot(mapFormData);", map_form_data
         )
         page.wait_for_timeout(15000)
-        page.screenshot(path="HEMLO.png")
+        page.screenshot(path=screenshot_path)
         browser.close()
 
-    print("Getting animation")
+    if products:
+        futures = derive_products(screenshot_path, products)
+        for name, future in futures.items():
+            # Report with this job's ids, not those of the pool's thread.
+            log_context = contextvars.copy_context()
+            future.add_done_callback(
+                lambda f, name=name, log_context=log_context: log_context.run(
+                    _report_print, name, f
+                )
+            )
+
+    logger.info("Getting animation")
     with sync_playwright() as p:
-        browser = p.chromium.launch(downloads_path="./")
+        browser = p.chromium.launch(downloads_path=job_dir)
         context = browser.new_context(accept_downloads=True)
         page = context.new_page()
-        page.on("console", lambda msg: print(msg.text))
+        page.on("console", log_console)
         with page.expect_download(
-            timeout=len(map_form_data["locations"]) * 15000 + 10000
+            timeout=len(journey.locations) * 15000 + 10000
         ) as download_info:
             page.goto(url_for("map", _external=True))
             page.evaluate(
                 "(mapFormData) => window.getAnimation(mapFormData);", map_form_data
             )
-            download_info.value.save_as(download_info.value.suggested_filename)
+            video_path = os.path.join(job_dir, download_info.value.suggested_filename)
+            download_info.value.save_as(video_path)
             download_info.value.delete()
-
-        print("All done")
         browser.close()
 
+    # Encoding happens in the background so the response doesn't wait on it.
+    # Submitted once Playwright is shut down, so a new pool worker never starts
+    # while the driver's pipes are open.
+    submit_animation(video_path)
+    logger.info("All done")
+
+
+@app.post("/bg")
+def bg():
+    """
+    Captures an animation and generates a background image of a map using provided map form data.
+    This endpoint expects a JSON payload with map form data, which includes:
+
+    - `locations`: Array of objects, each containing:
+      - `id`: Unique identifier for the location.
+      - `address`: Physical address.
+      - `arrival`: Arrival time at the location.
+      - `departure`: Departure time from the location.
+      - `coordinates`: Geographical coordinates as a string.
+      - `images`: Array of associated image files.
+    - `tileSrc`: Name of the map tile source.
+    - `products`: Optional array of product names from `PRODUCT_SPECS` to derive
+      print files for from the still.
+
+    The captured WebM is handed to the transcode process pool, which writes the
+    shareable video, a poster frame and a preview next to it after the response.
+
+    The payload is validated before any browser is launched, see `parse_journey`
+    and `parse_products`.
+    Renders are admitted against a memory and CPU budget, see `AdmissionController`.
+
+    Returns:
+        An empty response with a 200 OK status code if valid data received, else 400.
+        429 with a `Retry-After` header when too many renders are already running.
+    """
+    try:
+        journey = parse_journey(request.json)
+        products = parse_products(request.json, PRODUCT_SPECS)
+    except JourneyValidationError as e:
+        abort(HTTPStatus.BAD_REQUEST, description=str(e))
+
+    map_form_data = journey.to_map_form_data()
+    # Worked out once here and played back by the page, the plan is cached so
+    # re-rendering the same journey doesn't compute it again.
+    map_form_data["cameraPath"] = plan_camera_path(journey.coordinates).to_dict()
+    if TILE_URL:
+        map_form_data["tileUrl"] = TILE_URL
+
+    cost = estimate_render_cost(
+        SCREENSHOT_VIEWPORT["width"],
+        SCREENSHOT_VIEWPORT["height"],
+        len(journey.locations),
+        journey.image_count,
+    )
+    try:
+        with render_admission.admit(cost):
+            render_journey(journey, map_form_data, products)
+    except RenderRejected as e:
+        return (
+            jsonify(error=str(e)),
+            HTTPStatus.TOO_MANY_REQUESTS,
+            {"Retry-After": str(e.retry_after)},
+        )
+
     return "", HTTPStatus.OK
 
 
+@app.get("/renders")
+def renders():
+    """Live gauges of in flight and queued renders."""
+    return jsonify(render_admission.gauges()), HTTPStatus.OK
+
+
 @app.post("/get-address-suggestions")
 def get_address_suggestions():
     data = request.json
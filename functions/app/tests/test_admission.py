@@ -0,0 +1,119 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+from .. import app as app_module
+from ..utils.admission import (
+    AdmissionController,
+    RenderCost,
+    RenderRejected,
+    estimate_render_cost,
+)
+from .test_journey import make_form_data
+
+
+class AdmissionTestCase(unittest.TestCase):
+    def test_estimate_grows_with_viewport_and_images(self):
+        small = estimate_render_cost(1280, 720, 2, 0)
+        big = estimate_render_cost(7200, 5400, 2, 0)
+        with_images = estimate_render_cost(7200, 5400, 2, 6)
+        self.assertLess(small.memory_mb, big.memory_mb)
+        self.assertLess(big.memory_mb, with_images.memory_mb)
+        self.assertLess(big.cpu, with_images.cpu)
+
+    def test_queue_timeout_follows_render_time(self):
+        short = estimate_render_cost(7200, 5400, 2, 0)
+        long = estimate_render_cost(7200, 5400, 6, 0)
+        self.assertLess(short.seconds, long.seconds)
+        controller = AdmissionController(100, 1, queue_waves=2)
+        self.assertEqual(controller._queue_timeout(long), 2 * long.seconds)
+        # Measured render times take over from the estimate.
+        with controller.admit(RenderCost(memory_mb=100, cpu=1)):
+            pass
+        self.assertLess(controller._queue_timeout(long), 1)
+        explicit = AdmissionController(100, 1, queue_timeout=5)
+        self.assertEqual(explicit._queue_timeout(long), 5)
+
+    def test_admits_within_budget(self):
+        controller = AdmissionController(1000, 4, max_queue=0, queue_timeout=0)
+        cost = RenderCost(memory_mb=400, cpu=1)
+        with controller.admit(cost), controller.admit(cost):
+            self.assertEqual(controller.gauges()["in_flight"], 2)
+            with self.assertRaises(RenderRejected) as e:
+                with controller.admit(cost):
+                    pass
+            self.assertGreaterEqual(e.exception.retry_after, 1)
+        gauges = controller.gauges()
+        self.assertEqual(gauges["in_flight"], 0)
+        self.assertEqual(gauges["memory_mb"], 0)
+        self.assertEqual(gauges["rejected"], 1)
+
+    def test_oversized_job_runs_alone(self):
+        controller = AdmissionController(100, 1, max_queue=0, queue_timeout=0)
+        with controller.admit(RenderCost(memory_mb=500, cpu=2)):
+            self.assertEqual(controller.gauges()["in_flight"], 1)
+
+    def test_queued_job_times_out(self):
+        controller = AdmissionController(100, 1, max_queue=1, queue_timeout=0.05)
+        cost = RenderCost(memory_mb=100, cpu=1)
+        with controller.admit(cost):
+            with self.assertRaises(RenderRejected):
+                with controller.admit(cost):
+                    pass
+        self.assertEqual(controller.gauges()["queued"], 0)
+
+    def test_queued_job_runs_when_slot_frees(self):
+        controller = AdmissionController(100, 1, max_queue=1, queue_timeout=5)
+        cost = RenderCost(memory_mb=100, cpu=1)
+        admitted = threading.Event()
+
+        def wait_for_slot():
+            with controller.admit(cost):
+                admitted.set()
+
+        with controller.admit(cost):
+            waiter = threading.Thread(target=wait_for_slot)
+            waiter.start()
+            while controller.gauges()["queued"] == 0:
+                time.sleep(0.01)
+            self.assertFalse(admitted.is_set())
+        waiter.join(5)
+        self.assertTrue(admitted.is_set())
+
+    def test_bg_returns_429(self):
+        controller = AdmissionController(100, 1, max_queue=0, queue_timeout=0)
+        tester = app_module.app.test_client(self)
+        with mock.patch.object(app_module, "render_admission", controller):
+            with controller.admit(RenderCost(memory_mb=100, cpu=1)):
+                response = tester.post("/bg", json=make_form_data())
+        self.assertEqual(response.status_code, HTTPStatus.TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", response.headers)
+
+    def test_each_render_gets_its_own_directory(self):
+        job_dirs = []
+        with tempfile.TemporaryDirectory() as renders_dir, mock.patch.object(
+            app_module, "RENDERS_DIR", renders_dir
+        ), mock.patch.object(
+            app_module,
+            "_render_journey",
+            lambda *args: job_dirs.append(args[-1]),
+        ):
+            app_module.render_journey(None, {})
+            app_module.render_journey(None, {})
+            self.assertTrue(all(os.path.isdir(d) for d in job_dirs))
+        self.assertEqual(len(set(job_dirs)), 2)
+        self.assertEqual(os.path.dirname(job_dirs[0]), renders_dir)
+
+    def test_renders_gauges(self):
+        tester = app_module.app.test_client(self)
+        response = tester.get("/renders")
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn("queued", response.json)
+
+
+if __name__ == "__main__":
+    unittest.main()
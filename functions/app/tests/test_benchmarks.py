@@ -0,0 +1,137 @@
+import os
+import random
+import subprocess  # nosec B404
+import sys
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from benchmarks.bench import compare
+from benchmarks.load import (
+    SCENARIOS,
+    LambdaTransport,
+    RSSSampler,
+    _process_tree,
+    run_scenario,
+    summarize,
+)
+from benchmarks.stubs import StubServer, start_upstreams, stop_upstreams, tile_routes
+
+from ..utils import mapbox
+from ..utils.mapbox import get_geocoded_suggestions
+from ..utils.pod import Printify
+
+
+class StubsTestCase(unittest.TestCase):
+    def test_upstreams(self):
+        base_url = mapbox.MAPBOX_BASE_URL
+        upstreams = start_upstreams()
+        try:
+            self.assertEqual(len(get_geocoded_suggestions("Tallinn")), 5)
+            self.assertEqual(Printify.get_shops()[0]["title"], "Journeys")
+            tile = requests.get(upstreams["tiles"].url + "/tiles/1/0/0.png", timeout=5)
+            self.assertEqual(tile.headers["Content-Type"], "image/png")
+        finally:
+            stop_upstreams(upstreams)
+        self.assertEqual(mapbox.MAPBOX_BASE_URL, base_url)
+
+    def test_error_injection(self):
+        with StubServer(tile_routes, error_rate=1.0, error_status=429) as stub:
+            response = requests.get(stub.url + "/tiles/1/0/0.png", timeout=5)
+        self.assertEqual(response.status_code, 429)
+
+    def test_latency(self):
+        with StubServer(tile_routes, latency=0.05) as stub:
+            start = time.perf_counter()
+            requests.get(stub.url + "/tiles/1/0/0.png", timeout=5)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.05)
+
+
+class CompareTestCase(unittest.TestCase):
+    def test_regressions(self):
+        baseline = {"fast": {"median_ms": 0.1}, "slow": {"median_ms": 10.0}}
+        results = {
+            # Tripled, but well under the noise floor.
+            "fast": {"median_ms": 0.3},
+            "slow": {"median_ms": 14.0},
+            "new": {"median_ms": 1.0},
+        }
+        regressions = compare(results, baseline, tolerance=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("slow"))
+
+
+class LoadTestCase(unittest.TestCase):
+    def test_summarize(self):
+        samples = [("/", float(ms), ms != 100) for ms in range(1, 101)]
+        summary = summarize(
+            samples, elapsed=2.0, peak_rss_bytes=3 * 2**20, start_rss_bytes=2**20
+        )
+        self.assertEqual(summary["requests"], 100)
+        self.assertEqual(summary["throughput_rps"], 50)
+        self.assertEqual(summary["error_rate"], 0.01)
+        self.assertEqual(summary["p50_ms"], 51)
+        self.assertEqual(summary["p99_ms"], 99)
+        self.assertEqual(summary["peak_rss_mb"], 3)
+        self.assertEqual(summary["peak_rss_growth_mb"], 2)
+
+    @unittest.skipUnless(os.path.isdir("/proc/self"), "needs /proc")
+    def test_rss_includes_child_processes(self):
+        alone = RSSSampler.current_bytes()
+        child = subprocess.Popen(  # nosec B603
+            [sys.executable, "-c", "import time; time.sleep(30)"]
+        )
+        try:
+            time.sleep(0.2)
+            self.assertIn(child.pid, _process_tree(os.getpid()))
+            self.assertGreater(RSSSampler.current_bytes(), alone)
+        finally:
+            child.kill()
+            child.wait()
+
+    def test_no_renders_over_lambda(self):
+        transport = LambdaTransport()
+        paths = []
+        request = transport.request
+        transport.request = lambda method, path, body=None: (
+            paths.append(path) or request(method, path, body)
+        )
+        upstreams = start_upstreams()
+        try:
+            # Every roll of the dice asks for a render.
+            with mock.patch.object(random.Random, "random", return_value=0.0):
+                run_scenario(
+                    SCENARIOS["mixed"],
+                    transport,
+                    users=1,
+                    duration=0.2,
+                    think_scale=0.01,
+                    render=True,
+                )
+        finally:
+            stop_upstreams(upstreams)
+        self.assertIn("/", paths)
+        self.assertNotIn("/bg", paths)
+
+    def test_run_scenario_over_lambda(self):
+        upstreams = start_upstreams()
+        try:
+            summary = run_scenario(
+                SCENARIOS["mixed"],
+                LambdaTransport(),
+                users=2,
+                duration=0.5,
+                think_scale=0.01,
+                render=False,
+            )
+        finally:
+            stop_upstreams(upstreams)
+        self.assertGreater(summary["requests"], 0)
+        self.assertEqual(summary["errors"], 0)
+        self.assertGreater(summary["peak_rss_mb"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+import numpy as np
+
+from ..utils import camera
+
+TALLINN = (24.745369, 59.437216)
+RIGA = (24.1051846, 56.9493977)
+RIGA_NY = (-77.883898, 43.069506)
+
+
+class CameraPathTestCase(unittest.TestCase):
+    def test_great_circle_distance(self):
+        distances = camera.great_circle_distances(np.array([TALLINN, RIGA]))
+        self.assertAlmostEqual(distances[0] / 1000, 279, delta=1)
+
+    def test_zoom_levels_match_thresholds(self):
+        distances = np.array([10e3, 50e3, 279e3, 2500e3, 9000e3])
+        self.assertEqual(camera.get_zoom_levels(distances).tolist(), [12, 10, 9, 5, 4])
+
+    def test_plan_keyframes(self):
+        plan = camera.plan_camera_path((TALLINN, RIGA, RIGA_NY), fps=10)
+        self.assertEqual(plan.zooms, (9, 4))
+        self.assertEqual(len(plan.segments), 2)
+        # 10 seconds at 10 fps, plus the end point.
+        self.assertEqual(len(plan.segments[0]), 101)
+        start = camera.to_web_mercator(np.array([TALLINN, RIGA]))
+        np.testing.assert_allclose(plan.segments[0][0], start[0], atol=0.01)
+        np.testing.assert_allclose(plan.segments[0][-1], start[1], atol=0.01)
+        # Segments join up.
+        self.assertEqual(plan.segments[0][-1], plan.segments[1][0])
+
+    def test_great_circle_bends_towards_pole(self):
+        plan = camera.plan_camera_path((RIGA, RIGA_NY), fps=10)
+        frames = np.array(plan.segments[0])
+        # The shortest route across the Atlantic is north of both ends.
+        self.assertGreater(frames[:, 1].max(), frames[[0, -1], 1].max())
+
+    def test_antimeridian_does_not_jump(self):
+        plan = camera.plan_camera_path(((179.0, 0.0), (-179.0, 0.0)), fps=10)
+        steps = np.diff(np.array(plan.segments[0])[:, 0])
+        self.assertTrue((steps > 0).all())
+
+    def test_antimeridian_segments_join_up(self):
+        plan = camera.plan_camera_path(
+            ((170.0, 0.0), (-170.0, 0.0), (-160.0, 0.0)), fps=10
+        )
+        first, second = (np.array(segment) for segment in plan.segments)
+        np.testing.assert_array_equal(first[-1], second[0])
+        # Keeps heading east the whole way, past the edge of the map.
+        steps = np.diff(np.concatenate([first, second[1:]])[:, 0])
+        self.assertTrue((steps > 0).all())
+        self.assertGreater(second[-1, 0], camera.MERCATOR_RADIUS * np.pi)
+
+    def test_plan_is_immutable(self):
+        plan = camera.plan_camera_path((TALLINN, RIGA))
+        with self.assertRaises(AttributeError):
+            plan.segments = ()
+        with self.assertRaises(TypeError):
+            plan.segments[0][0] = (0, 0)
+        data = plan.to_dict()
+        self.assertEqual(data["segmentDuration"], camera.SEGMENT_DURATION)
+        self.assertIsNot(data, plan.to_dict())
+
+    def test_single_location(self):
+        plan = camera.plan_camera_path((TALLINN,))
+        self.assertEqual(plan.segments, ())
+        self.assertEqual(plan.zooms, ())
+
+
+if __name__ == "__main__":
+    unittest.main()
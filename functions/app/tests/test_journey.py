@@ -0,0 +1,99 @@
+import unittest
+from datetime import date
+from http import HTTPStatus
+
+from ..app import app
+from ..utils.journey import JourneyValidationError, parse_journey, parse_products
+from ..utils.prints import PRODUCT_SPECS
+
+
+def make_location(**overrides):
+    location = {
+        "id": "address-1",
+        "address": "Tallinn, Harju, Estonia",
+        "arrival": "2024-01-01",
+        "departure": "2024-01-03",
+        "coordinates": "[24.745369,59.437216]",
+        "images": [],
+    }
+    location.update(overrides)
+    return location
+
+
+def make_form_data(*locations, tile_src="osm_bright"):
+    return {"tileSrc": tile_src, "locations": list(locations or [make_location()])}
+
+
+class JourneyTestCase(unittest.TestCase):
+    def test_parse(self):
+        journey = parse_journey(make_form_data())
+        location = journey.locations[0]
+        self.assertEqual(location.coordinates, (24.745369, 59.437216))
+        self.assertEqual(location.arrival, date(2024, 1, 1))
+        self.assertEqual(journey.coordinates, ((24.745369, 59.437216),))
+
+    def test_hashable_and_canonical(self):
+        a = parse_journey(
+            make_form_data(make_location(coordinates="[24.745369, 59.437216]"))
+        )
+        b = parse_journey(make_form_data())
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual(a.to_map_form_data(), b.to_map_form_data())
+        self.assertEqual(parse_journey(a.to_map_form_data()), a)
+
+    def test_empty_dates_allowed(self):
+        journey = parse_journey(make_form_data(make_location(arrival="", departure="")))
+        self.assertIsNone(journey.locations[0].arrival)
+
+    def test_invalid(self):
+        cases = [
+            {"locations": [make_location()], "tileSrc": "nope"},
+            make_form_data(tile_src="osm_bright") | {"locations": []},
+            make_form_data(make_location(coordinates="[24.7]")),
+            make_form_data(make_location(coordinates="not json")),
+            make_form_data(make_location(coordinates="[200, 0]")),
+            make_form_data(make_location(coordinates='["NaN", 0]')),
+            make_form_data(make_location(departure="2023-12-31")),
+            make_form_data(make_location(arrival="01/01/2024")),
+            make_form_data(make_location(images=["file:///etc/passwd"])),
+            make_form_data(make_location(images=["data:image/png;base64,"] * 4)),
+            make_form_data(
+                make_location(),
+                make_location(arrival="2024-01-02", departure="2024-01-04"),
+            ),
+        ]
+        for data in cases:
+            with self.subTest(data=data):
+                with self.assertRaises(JourneyValidationError):
+                    parse_journey(data)
+
+    def test_parse_products(self):
+        self.assertEqual(parse_products(make_form_data(), PRODUCT_SPECS), ())
+        data = make_form_data() | {"products": ["mug-11oz", "preview"]}
+        self.assertEqual(
+            parse_products(data, PRODUCT_SPECS),
+            (PRODUCT_SPECS["mug-11oz"], PRODUCT_SPECS["preview"]),
+        )
+        for products in (5, "mug-11oz", {"mug-11oz": 1}, ["mug-11oz", 5], ["nope"]):
+            with self.subTest(products=products):
+                with self.assertRaises(JourneyValidationError):
+                    parse_products(
+                        make_form_data() | {"products": products}, PRODUCT_SPECS
+                    )
+
+    def test_bg_rejects_bad_products(self):
+        tester = app.test_client(self)
+        response = tester.post("/bg", json=make_form_data() | {"products": 5})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("products", response.json["error"])
+
+    def test_bg_rejects_before_rendering(self):
+        tester = app.test_client(self)
+        data = make_form_data(make_location(coordinates="[24.7]"))
+        response = tester.post("/bg", json=data)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn("coordinates", response.json["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
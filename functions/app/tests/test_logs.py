@@ -0,0 +1,129 @@
+import io
+import logging
+import unittest
+from unittest import mock
+
+from ..app import app
+from ..utils import flasklambda, logs
+from ..utils.logs import LogPipeline, RateLimitFilter, job_id, request_id
+
+
+class LogsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.stream = io.StringIO()
+        self.pipeline = LogPipeline(stream=self.stream, batch_size=1000)
+        self.logger = logging.getLogger(f"{__name__}.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.pipeline.handler)
+        self.pipeline.start()
+
+    def tearDown(self):
+        self.pipeline.stop()
+        self.logger.removeHandler(self.pipeline.handler)
+
+    def lines(self):
+        self.pipeline.stop()
+        return self.stream.getvalue().splitlines()
+
+    def test_tags_request_and_job(self):
+        request_token = request_id.set("req-1")
+        job_token = job_id.set("job-1")
+        try:
+            self.logger.info("hello %s", "world")
+        finally:
+            job_id.reset(job_token)
+            request_id.reset(request_token)
+        self.logger.info("explicit", extra={"request_id": "req-2", "job_id": "job-2"})
+
+        first, second = self.lines()
+        self.assertIn("request=req-1 job=job-1 hello world", first)
+        self.assertIn("request=req-2 job=job-2 explicit", second)
+
+    def test_untagged(self):
+        self.logger.info("plain")
+        self.assertIn("request=- job=- plain", self.lines()[0])
+
+    def test_flushes_on_interval(self):
+        pipeline = LogPipeline(stream=io.StringIO(), flush_interval=0.01)
+        pipeline.start()
+        pipeline.handler.handle(
+            logging.LogRecord("x", logging.INFO, __file__, 1, "tick", None, None)
+        )
+        for _ in range(500):
+            if pipeline.stream.getvalue():
+                break
+            pipeline._thread.join(0.01)
+        self.assertIn("tick", pipeline.stream.getvalue())
+        pipeline.stop()
+
+    def test_flush_writes_without_stopping(self):
+        pipeline = LogPipeline(stream=io.StringIO(), flush_interval=60)
+        pipeline.start()
+        pipeline.handler.handle(
+            logging.LogRecord("x", logging.INFO, __file__, 1, "before", None, None)
+        )
+        self.assertTrue(pipeline.flush())
+        self.assertIn("before", pipeline.stream.getvalue())
+        self.assertTrue(pipeline._thread.is_alive())
+        pipeline.stop()
+
+    def test_lambda_flushes_before_returning(self):
+        event = {
+            "httpMethod": "GET",
+            "path": "/",
+            "headers": {"Host": "localhost"},
+            "multiValueQueryStringParameters": None,
+            "body": None,
+            "requestContext": {"stage": "prod"},
+        }
+        context = mock.Mock(aws_request_id="req")
+        with mock.patch.object(flasklambda, "flush_logs") as flush_logs:
+            response = app(event, context)
+        self.assertEqual(response["statusCode"], 200)
+        flush_logs.assert_called_once_with()
+
+    def test_setup_replaces_root_handlers(self):
+        root = logging.getLogger()
+        handlers, level = root.handlers[:], root.level
+        runtime_handler = logging.StreamHandler(io.StringIO())
+        root.addHandler(runtime_handler)
+        with mock.patch.object(logs, "_pipeline", None), mock.patch("atexit.register"):
+            pipeline = logs.setup_logging(stream=io.StringIO())
+        try:
+            self.assertEqual(root.handlers, [pipeline.handler])
+        finally:
+            pipeline.stop()
+            root.handlers[:] = handlers
+            root.setLevel(level)
+
+    def test_drops_when_queue_full(self):
+        pipeline = LogPipeline(stream=io.StringIO(), queue_size=1)
+        record = logging.LogRecord("x", logging.INFO, __file__, 1, "m", None, None)
+        pipeline.handler.handle(record)
+        pipeline.handler.handle(record)
+        self.assertEqual(pipeline.handler.dropped, 1)
+
+    def test_rate_limit(self):
+        limiter = RateLimitFilter(rate=0, burst=3)
+        self.logger.addFilter(limiter)
+        for i in range(10):
+            self.logger.info("frame %d", i)
+        # Pretend the bucket refilled.
+        limiter._tokens = 1
+        self.logger.info("after")
+
+        lines = self.lines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn("frame 2", lines[2])
+        self.assertIn("after (7 messages suppressed)", lines[3])
+
+    def test_request_id_from_header(self):
+        with app.test_request_context("/", headers={"X-Request-Id": "abc123"}):
+            app.preprocess_request()
+            self.assertEqual(request_id.get(), "abc123")
+        self.assertEqual(request_id.get(), "-")
+
+
+if __name__ == "__main__":
+    unittest.main()
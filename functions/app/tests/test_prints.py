@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from http import HTTPStatus
+from unittest import mock
+
+from PIL import Image
+
+from ..app import app
+from ..utils import prints
+from ..utils.prints import ProductSpec
+from .test_journey import make_form_data
+
+
+class PrintsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.master = os.path.join(self.tmp.name, "master.png")
+        Image.new("RGBA", (720, 540), (10, 20, 30, 255)).save(self.master)
+        self.master_hash, self.stored = prints.store_master(self.master, self.cache_dir)
+
+    def tearDown(self):
+        # The pool's workers may have started in this directory.
+        prints.pool.shutdown()
+        self.tmp.cleanup()
+
+    def test_crop_resize_and_convert(self):
+        spec = ProductSpec("mug", 300, 140, dpi=300, format="JPEG")
+        path = prints.derive(self.stored, self.master_hash, spec, self.cache_dir)
+        self.assertTrue(path.endswith(".jpg"))
+        with Image.open(path) as image:
+            self.assertEqual(image.size, (300, 140))
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(image.mode, "RGB")
+            self.assertEqual(round(image.info["dpi"][0]), 300)
+
+    def test_cached_by_master_and_spec(self):
+        spec = ProductSpec("poster", 60, 80)
+        first = prints.derive(self.stored, self.master_hash, spec, self.cache_dir)
+        with mock.patch.object(prints.Image, "open") as image_open:
+            second = prints.derive(self.stored, self.master_hash, spec, self.cache_dir)
+        image_open.assert_not_called()
+        self.assertEqual(first, second)
+
+        other_spec = ProductSpec("poster", 60, 80, dpi=150)
+        self.assertNotEqual(
+            first, prints.derivative_path(self.master_hash, other_spec, self.cache_dir)
+        )
+        self.assertNotEqual(
+            first, prints.derivative_path("0" * 64, spec, self.cache_dir)
+        )
+
+    def test_master_survives_overwrite(self):
+        Image.new("RGB", (10, 10)).save(self.master)
+        with Image.open(self.stored) as image:
+            self.assertEqual(image.size, (720, 540))
+
+    def test_derive_products_in_pool(self):
+        specs = [ProductSpec("a", 40, 30), ProductSpec("b", 30, 40, format="WEBP")]
+        futures = prints.derive_products(self.master, specs, self.cache_dir)
+        for name, future in futures.items():
+            self.assertTrue(os.path.exists(future.result(timeout=30)), name)
+
+    def test_shutdown_waits_for_jobs(self):
+        futures = prints.derive_products(
+            self.master, [ProductSpec("a", 40, 30)], self.cache_dir
+        )
+        prints.pool.shutdown()
+        self.assertTrue(all(future.done() for future in futures.values()))
+        self.assertIsNone(prints.pool._executor)
+
+    def test_relative_cache_dir(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        try:
+            futures = prints.derive_products(
+                self.master, [ProductSpec("a", 40, 30)], "relative-cache"
+            )
+            path = futures["a"].result(timeout=30)
+        finally:
+            os.chdir(cwd)
+        self.assertTrue(os.path.isabs(path))
+        self.assertTrue(path.startswith(os.path.join(self.tmp.name, "relative-cache")))
+
+    def test_no_temporary_files_left(self):
+        spec = ProductSpec("poster", 60, 80)
+        path = prints.derive(self.stored, self.master_hash, spec, self.cache_dir)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [os.path.basename(path)])
+
+    def test_bg_rejects_unknown_products(self):
+        tester = app.test_client(self)
+        data = make_form_data() | {"products": ["yacht-sail"]}
+        response = tester.post("/bg", json=data)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import logging
+import os
+import stat
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from ..utils import transcode
+from ..utils.logs import job_id
+from ..utils.workers import atomic_path
+
+# Stands in for ffmpeg: writes the output file named last on the command line,
+# or fails like ffmpeg does when FAKE_FFMPEG_FAIL is set.
+FAKE_FFMPEG = f"""#!{sys.executable}
+import os, sys
+with open(sys.argv[-1], "w") as f:
+    f.write(" ".join(sys.argv[1:]))
+if os.environ.get("FAKE_FFMPEG_FAIL"):
+    sys.stderr.write("Invalid data found when processing input")
+    sys.exit(1)
+"""
+
+
+class TranscodeTestCase(unittest.TestCase):
+    def test_transcode_command(self):
+        command = transcode.build_transcode_command(
+            "in.webm", "out.mp4", codec="libx264", bitrate="2M", width=1280
+        )
+        self.assertEqual(command[0], "ffmpeg")
+        self.assertIn("libx264", command)
+        self.assertIn("2M", command)
+        self.assertIn("scale='min(1280,iw)':-2", command)
+        self.assertIn("+faststart", command)
+        self.assertEqual(command[-1], "out.mp4")
+
+    def test_faststart_only_for_mp4(self):
+        command = transcode.build_transcode_command(
+            "in.webm", "out.webm", codec="libvpx-vp9"
+        )
+        self.assertNotIn("-movflags", command)
+
+    def test_poster_command_grabs_one_frame(self):
+        command = transcode.build_poster_command("in.webm", "poster.jpg", at=2)
+        self.assertEqual(command[command.index("-frames:v") + 1], "1")
+        self.assertEqual(command[command.index("-ss") + 1], "2")
+
+    def test_missing_ffmpeg(self):
+        with mock.patch("shutil.which", return_value=None):
+            with self.assertRaises(transcode.TranscodeError):
+                transcode.process_animation("in.webm")
+
+
+@unittest.skipIf(sys.platform == "win32", "the fake ffmpeg is a script")
+class ProcessAnimationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        bin_dir = os.path.join(self.tmp.name, "bin")
+        os.mkdir(bin_dir)
+        ffmpeg = os.path.join(bin_dir, "ffmpeg")
+        with open(ffmpeg, "w") as f:
+            f.write(FAKE_FFMPEG)
+        os.chmod(ffmpeg, os.stat(ffmpeg).st_mode | stat.S_IXUSR)
+        path = bin_dir + os.pathsep + os.environ.get("PATH", "")
+        self.env = mock.patch.dict(os.environ, {"PATH": path})
+        self.env.start()
+        self.src = os.path.join(self.tmp.name, "mapAnimation.webm")
+        open(self.src, "wb").close()
+
+    def tearDown(self):
+        transcode.pool.shutdown()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_outputs(self):
+        outputs = transcode.process_animation(self.src)
+        self.assertEqual(
+            outputs,
+            {
+                "video": os.path.join(self.tmp.name, "mapAnimation.mp4"),
+                "poster": os.path.join(self.tmp.name, "mapAnimation-poster.jpg"),
+                "preview": os.path.join(self.tmp.name, "mapAnimation-preview.mp4"),
+            },
+        )
+        with open(outputs["video"]) as f:
+            self.assertIn("+faststart", f.read())
+        # Only the outputs were moved into place, no temporary files are left.
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            sorted(
+                ["bin", "mapAnimation.webm"]
+                + [os.path.basename(p) for p in outputs.values()]
+            ),
+        )
+
+    def test_out_dir(self):
+        out_dir = os.path.join(self.tmp.name, "out")
+        os.mkdir(out_dir)
+        outputs = transcode.process_animation(self.src, out_dir)
+        self.assertTrue(all(p.startswith(out_dir) for p in outputs.values()))
+
+    def test_failure_leaves_nothing_behind(self):
+        dest = os.path.join(self.tmp.name, "out.mp4")
+        with mock.patch.dict(os.environ, {"FAKE_FFMPEG_FAIL": "1"}):
+            with self.assertRaises(transcode.TranscodeError) as raised:
+                with atomic_path(dest) as partial:
+                    transcode._run(
+                        transcode.build_transcode_command(self.src, partial), dest
+                    )
+        self.assertIn(dest, str(raised.exception))
+        self.assertIn("Invalid data", str(raised.exception))
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)), ["bin", "mapAnimation.webm"]
+        )
+
+    def test_submit_reports_with_callers_ids(self):
+        reported = []
+        done = threading.Event()
+
+        class Recorder(logging.Handler):
+            def emit(self, record):
+                reported.append((record.getMessage(), job_id.get()))
+                done.set()
+
+        recorder = Recorder()
+        transcode.logger.addHandler(recorder)
+        transcode.logger.setLevel(logging.INFO)
+        transcode.logger.propagate = False
+        token = job_id.set("job-7")
+        try:
+            transcode.submit_animation(self.src).result(timeout=60)
+        finally:
+            job_id.reset(token)
+        try:
+            self.assertTrue(done.wait(10))
+        finally:
+            transcode.logger.removeHandler(recorder)
+            transcode.logger.setLevel(logging.NOTSET)
+            transcode.logger.propagate = True
+        message, job = reported[0]
+        self.assertTrue(message.startswith("Transcode finished"))
+        self.assertEqual(job, "job-7")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,213 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+RENDER_MEMORY_BUDGET_MB = int(os.environ.get("RENDER_MEMORY_BUDGET_MB", 4096))
+RENDER_CPU_BUDGET = float(os.environ.get("RENDER_CPU_BUDGET", os.cpu_count() or 1))
+RENDER_MAX_QUEUE = int(os.environ.get("RENDER_MAX_QUEUE", 4))
+# Seconds a job may wait for a slot. Unset, it's RENDER_QUEUE_WAVES times how long
+# a render is expected to take, see `AdmissionController`.
+RENDER_QUEUE_TIMEOUT = os.environ.get("RENDER_QUEUE_TIMEOUT")
+RENDER_QUEUE_WAVES = float(os.environ.get("RENDER_QUEUE_WAVES", 2))
+
+# Rough figures measured on headless Chromium, good enough to keep a host from
+# running out of memory, not an exact account.
+BROWSER_BASE_MB = 250
+# The canvas, the compositor's copy and the screenshot being encoded.
+VIEWPORT_COPIES = 3
+BYTES_PER_PIXEL = 4
+LOCATION_MB = 2
+# Decoded polaroid plus the data URL it came from.
+IMAGE_MB = 25
+BROWSER_CPU = 1.0
+IMAGE_CPU = 0.05
+# The still waits this long for tiles to settle, see `_render_journey` in app.py.
+STILL_SECONDS = 15
+# The animation spends SEGMENT_DURATION in utils/camera.py on every location.
+LOCATION_SECONDS = 10
+
+
+@dataclass(frozen=True, slots=True)
+class RenderCost:
+    memory_mb: float
+    cpu: float
+    seconds: float = 0.0
+
+
+class RenderRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_render_cost(viewport_width, viewport_height, location_count, image_count):
+    """
+    Estimates what a `/bg` render will take from the host.
+
+    Args:
+        viewport_width (int): Width in pixels of the largest viewport used.
+        viewport_height (int): Height in pixels of the largest viewport used.
+        location_count (int): Number of locations in the journey.
+        image_count (int): Number of images across all locations.
+
+    Returns:
+        RenderCost: Estimated peak memory in MB, CPU cores and how many seconds
+            the render holds its slot.
+    """
+    viewport_mb = (
+        viewport_width * viewport_height * BYTES_PER_PIXEL * VIEWPORT_COPIES / 2**20
+    )
+    memory_mb = (
+        BROWSER_BASE_MB
+        + viewport_mb
+        + location_count * LOCATION_MB
+        + image_count * IMAGE_MB
+    )
+    return RenderCost(
+        memory_mb=memory_mb,
+        cpu=BROWSER_CPU + image_count * IMAGE_CPU,
+        seconds=STILL_SECONDS + location_count * LOCATION_SECONDS,
+    )
+
+
+class AdmissionController:
+    """
+    Admits renders against a memory and CPU budget. Jobs that don't fit wait in a
+    bounded, first come first served queue, and are rejected when the queue is
+    full or they've waited too long.
+
+    A job bigger than the whole budget is still let through once nothing else is
+    running, otherwise it could never run at all.
+
+    A render takes tens of seconds, so a queued job has to be able to wait at least
+    that long for the queue to do anything. Unless `queue_timeout` is given, a job
+    waits up to `queue_waves` times the expected render time, the average of the
+    renders so far or else the job's own estimate. Waiting longer lets more jobs
+    through a burst, at the cost of holding their requests open for longer.
+    """
+
+    def __init__(
+        self,
+        memory_budget_mb=RENDER_MEMORY_BUDGET_MB,
+        cpu_budget=RENDER_CPU_BUDGET,
+        max_queue=RENDER_MAX_QUEUE,
+        queue_timeout=RENDER_QUEUE_TIMEOUT,
+        queue_waves=RENDER_QUEUE_WAVES,
+    ):
+        self.memory_budget_mb = memory_budget_mb
+        self.cpu_budget = cpu_budget
+        self.max_queue = max_queue
+        self.queue_timeout = float(queue_timeout) if queue_timeout is not None else None
+        self.queue_waves = queue_waves
+
+        self._condition = threading.Condition()
+        self._waiting = deque()
+        self._in_flight = 0
+        self._memory_mb = 0.0
+        self._cpu = 0.0
+        self._admitted = 0
+        self._rejected = 0
+        # Exponentially weighted average of how long a render holds its slot,
+        # used to tell rejected clients when to come back.
+        self._average_duration = None
+
+    def _fits(self, cost):
+        if self._in_flight == 0:
+            return True
+        return (
+            self._memory_mb + cost.memory_mb <= self.memory_budget_mb
+            and self._cpu + cost.cpu <= self.cpu_budget
+        )
+
+    def _expected_duration(self, cost):
+        return self._average_duration or cost.seconds
+
+    def _queue_timeout(self, cost):
+        if self.queue_timeout is not None:
+            return self.queue_timeout
+        return self.queue_waves * self._expected_duration(cost)
+
+    def _retry_after(self, cost):
+        waves = (len(self._waiting) + 1) / max(1, self._in_flight)
+        return max(1, math.ceil(self._expected_duration(cost) * waves))
+
+    def _reject(self, message, cost):
+        self._rejected += 1
+        raise RenderRejected(message, self._retry_after(cost))
+
+    def _acquire(self, cost):
+        with self._condition:
+            if not self._waiting and self._fits(cost):
+                self._take(cost)
+                return
+            if len(self._waiting) >= self.max_queue:
+                self._reject("Too many renders queued", cost)
+
+            ticket = object()
+            self._waiting.append(ticket)
+            deadline = time.monotonic() + self._queue_timeout(cost)
+            try:
+                while not (self._waiting[0] is ticket and self._fits(cost)):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._reject("Timed out waiting for a render slot", cost)
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting.remove(ticket)
+                # The next job in line may fit now that this one moved on.
+                self._condition.notify_all()
+            self._take(cost)
+
+    def _take(self, cost):
+        self._in_flight += 1
+        self._admitted += 1
+        self._memory_mb += cost.memory_mb
+        self._cpu += cost.cpu
+
+    def _release(self, cost, duration):
+        with self._condition:
+            self._in_flight -= 1
+            self._memory_mb -= cost.memory_mb
+            self._cpu -= cost.cpu
+            if self._average_duration is None:
+                self._average_duration = duration
+            else:
+                self._average_duration += 0.2 * (duration - self._average_duration)
+            self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, cost):
+        """
+        Holds a render slot for the duration of the `with` block.
+
+        Args:
+            cost (RenderCost): The estimated cost of the render.
+
+        Raises:
+            RenderRejected: When the job can't be admitted, with a `retry_after`
+                in seconds.
+        """
+        self._acquire(cost)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(cost, time.monotonic() - start)
+
+    def gauges(self):
+        """Returns a snapshot of the controller's state."""
+        with self._condition:
+            return {
+                "in_flight": self._in_flight,
+                "queued": len(self._waiting),
+                "memory_mb": round(self._memory_mb, 1),
+                "memory_budget_mb": self.memory_budget_mb,
+                "cpu": round(self._cpu, 2),
+                "cpu_budget": self.cpu_budget,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+            }
@@ -0,0 +1,168 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+# Mean earth radius, the same one `ol/sphere.getDistance` uses.
+EARTH_RADIUS = 6371008.8
+# Radius of the EPSG:3857 (web mercator) sphere.
+MERCATOR_RADIUS = 6378137.0
+MAX_MERCATOR_LATITUDE = 85.0511287798
+
+CAPTURE_FPS = 25
+SEGMENT_DURATION = 10000  # ms, matches ANIMATION_DURATION in map.js
+
+# Mirrors the thresholds in `getZoomLevel` in client/static/map.js.
+# A segment shorter than the distance (in meters) gets the zoom level next to it,
+# anything longer than the last threshold uses the last zoom level.
+ZOOM_THRESHOLDS = np.array([50e3, 200e3, 500e3, 1000e3, 1500e3, 2000e3, 3000e3, 8000e3])
+ZOOM_LEVELS = np.array([12, 10, 9, 8, 7, 6, 5, 4, 4])
+
+
+def to_unit_vectors(lon_lat):
+    """
+    Converts an (n, 2) array of [longitude, latitude] degrees into (n, 3) unit
+    vectors on the sphere.
+    """
+    lon, lat = np.radians(lon_lat).T
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], -1)
+
+
+def great_circle_distances(lon_lat):
+    """
+    Returns the great-circle distance in meters between consecutive coordinates.
+
+    Args:
+        lon_lat (np.ndarray): (n, 2) array of [longitude, latitude] degrees.
+
+    Returns:
+        np.ndarray: (n - 1,) array of distances.
+    """
+    vectors = to_unit_vectors(lon_lat)
+    chords = np.linalg.norm(vectors[1:] - vectors[:-1], axis=-1)
+    # The chord form stays accurate for short distances, unlike arccos of the dot.
+    return EARTH_RADIUS * 2 * np.arcsin(np.clip(chords / 2, 0, 1))
+
+
+def get_zoom_levels(distances):
+    """
+    Picks the zoom level for each segment distance, same as `getZoomLevel` in map.js.
+
+    Args:
+        distances (np.ndarray): Segment lengths in meters.
+
+    Returns:
+        np.ndarray: One integer zoom level per segment.
+    """
+    return ZOOM_LEVELS[np.searchsorted(ZOOM_THRESHOLDS, distances, side="right")]
+
+
+def interpolate_great_circles(lon_lat, steps):
+    """
+    Spherically interpolates every segment of the route in one go.
+
+    Args:
+        lon_lat (np.ndarray): (n, 2) array of [longitude, latitude] degrees.
+        steps (int): Number of intervals per segment, each segment gets
+            `steps + 1` points including both of its ends.
+
+    Returns:
+        np.ndarray: (n - 1, steps + 1, 2) array of [longitude, latitude] degrees.
+    """
+    vectors = to_unit_vectors(lon_lat)
+    start, end = vectors[:-1, None, :], vectors[1:, None, :]
+    omega = np.arccos(np.clip(np.sum(start * end, axis=-1, keepdims=True), -1, 1))
+    t = np.linspace(0, 1, steps + 1)[None, :, None]
+
+    sin_omega = np.sin(omega)
+    degenerate = sin_omega < 1e-12
+    safe_sin = np.where(degenerate, 1, sin_omega)
+    # Fall back to plain linear weights for repeated points.
+    start_weight = np.where(degenerate, 1 - t, np.sin((1 - t) * omega) / safe_sin)
+    end_weight = np.where(degenerate, t, np.sin(t * omega) / safe_sin)
+
+    points = start_weight * start + end_weight * end
+    points /= np.linalg.norm(points, axis=-1, keepdims=True)
+    lon = np.degrees(np.arctan2(points[..., 1], points[..., 0]))
+    lat = np.degrees(np.arcsin(np.clip(points[..., 2], -1, 1)))
+    return np.stack([lon, lat], -1)
+
+
+def to_web_mercator(lon_lat):
+    """
+    Projects [longitude, latitude] degrees to EPSG:3857, the projection the map
+    view uses. Works on (..., 2) arrays of points along one path, in order, e.g.
+    the (segments, keyframes, 2) array of a whole journey.
+
+    Longitudes are unwrapped over the whole path first, so a route crossing the
+    antimeridian keeps going instead of jumping to the other side of the map,
+    and every segment still starts where the previous one ended. The map wraps
+    horizontally, so this looks the same on screen.
+    """
+    lon = np.unwrap(np.radians(lon_lat[..., 0]).ravel()).reshape(lon_lat.shape[:-1])
+    lat = np.radians(
+        np.clip(lon_lat[..., 1], -MAX_MERCATOR_LATITUDE, MAX_MERCATOR_LATITUDE)
+    )
+    x = MERCATOR_RADIUS * lon
+    y = MERCATOR_RADIUS * np.log(np.tan(np.pi / 4 + lat / 2))
+    return np.stack([x, y], -1)
+
+
+@dataclass(frozen=True, slots=True)
+class CameraPlan:
+    fps: int
+    segment_duration: int
+    zooms: tuple[int, ...] = ()
+    segments: tuple[tuple[tuple[float, float], ...], ...] = ()
+
+    def to_dict(self):
+        """Returns the plan in the shape `animateLine` in map.js expects."""
+        return {
+            "fps": self.fps,
+            "segmentDuration": self.segment_duration,
+            "zooms": self.zooms,
+            "segments": self.segments,
+        }
+
+
+@lru_cache(maxsize=128)
+def plan_camera_path(coordinates, fps=CAPTURE_FPS, segment_duration=SEGMENT_DURATION):
+    """
+    Precomputes the whole camera path of the journey animation so the page only
+    has to play it back instead of doing the geometry every frame.
+
+    Only the animation plays the plan back, the still frames the whole journey
+    without it. The plan is cached on its arguments, so the same journey
+    rendered again only pays for it once. It's immutable, as every caller gets
+    the same instance.
+
+    Args:
+        coordinates (tuple): Tuple of (longitude, latitude) pairs, one per location.
+        fps (int): Keyframes per second of animation.
+        segment_duration (int): Time in ms the animation spends on each segment.
+
+    Returns:
+        CameraPlan: With:
+          - `fps`: The keyframe rate.
+          - `segment_duration`: Time in ms spent on each segment.
+          - `zooms`: Zoom level of each segment.
+          - `segments`: For each segment, the (x, y) EPSG:3857 center of every
+            keyframe, from the start location to the end location along the
+            great circle between them.
+    """
+    lon_lat = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+    if len(lon_lat) < 2:
+        return CameraPlan(fps, segment_duration)
+
+    steps = max(1, round(fps * segment_duration / 1000))
+    zooms = get_zoom_levels(great_circle_distances(lon_lat)).tolist()
+    frames = to_web_mercator(interpolate_great_circles(lon_lat, steps))
+    return CameraPlan(
+        fps,
+        segment_duration,
+        zooms=tuple(zooms),
+        segments=tuple(
+            tuple(map(tuple, segment)) for segment in np.round(frames, 2).tolist()
+        ),
+    )
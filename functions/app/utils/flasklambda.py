@@ -5,6 +5,8 @@ from flask import Flask
 import os
 from werkzeug.test import EnvironBuilder
 
+from .logs import flush_logs
+
 
 # This function converts an AWS ApiGateway event into
 # a WSGI Environ that flask recognizes.
@@ -51,7 +53,12 @@ class FlaskLambda(Flask):
             wsgi_status.append(status)
             wsgi_headers.append(headers)
 
-        resp = list(self.wsgi_app(environ, start_response))
+        try:
+            resp = list(self.wsgi_app(environ, start_response))
+        finally:
+            # Lambda freezes the sandbox once this returns, so nothing logged
+            # while handling the event may be left in the queue.
+            flush_logs()
 
         # Check content type before decoding response
         content_type = None
@@ -0,0 +1,196 @@
+import json
+import math
+from dataclasses import dataclass
+from datetime import date
+
+# Mirrors `sourceOptions` in `setMapSource` in client/static/map.js.
+TILE_SOURCES = frozenset(
+    {
+        "stamen_toner",
+        "stamen_watercolor",
+        "stamen_terrain",
+        "alidade_smooth_dark",
+        "outdoors",
+        "osm_bright",
+    }
+)
+MAX_IMAGES_PER_LOCATION = 3
+IMAGE_PREFIXES = ("data:image/", "https://", "http://")
+
+
+class JourneyValidationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Location:
+    id: str
+    address: str
+    coordinates: tuple[float, float]
+    arrival: date | None = None
+    departure: date | None = None
+    images: tuple[str, ...] = ()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "address": self.address,
+            "arrival": self.arrival.isoformat() if self.arrival else "",
+            "departure": self.departure.isoformat() if self.departure else "",
+            "coordinates": json.dumps(list(self.coordinates)),
+            "images": list(self.images),
+        }
+
+
+@dataclass(frozen=True, slots=True)
+class Journey:
+    tile_src: str
+    locations: tuple[Location, ...]
+
+    @property
+    def coordinates(self):
+        """(longitude, latitude) of every location, in order."""
+        return tuple(location.coordinates for location in self.locations)
+
+    @property
+    def image_count(self):
+        return sum(len(location.images) for location in self.locations)
+
+    def to_map_form_data(self):
+        """
+        Returns the journey in the shape `prepForScreenshot` and `getAnimation`
+        expect on the map page.
+        """
+        return {
+            "tileSrc": self.tile_src,
+            "locations": [location.to_dict() for location in self.locations],
+        }
+
+
+def _parse_coordinates(value, where):
+    try:
+        coordinates = json.loads(value) if isinstance(value, str) else value
+        lon, lat = (float(c) for c in coordinates)
+    except (TypeError, ValueError):
+        raise JourneyValidationError(
+            f"{where}: coordinates must be a [longitude, latitude] pair"
+        )
+    if not (math.isfinite(lon) and math.isfinite(lat)):
+        raise JourneyValidationError(f"{where}: coordinates must be finite numbers")
+    if not (-180 <= lon <= 180 and -90 <= lat <= 90):
+        raise JourneyValidationError(f"{where}: coordinates are out of range")
+    return lon, lat
+
+
+def _parse_date(value, where, field):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise JourneyValidationError(f"{where}: {field} must be a YYYY-MM-DD date")
+
+
+def _parse_images(value, where):
+    if value is None:
+        return ()
+    if not isinstance(value, list):
+        raise JourneyValidationError(f"{where}: images must be a list")
+    if len(value) > MAX_IMAGES_PER_LOCATION:
+        raise JourneyValidationError(
+            f"{where}: at most {MAX_IMAGES_PER_LOCATION} images are allowed"
+        )
+    for image in value:
+        if not isinstance(image, str) or not image.startswith(IMAGE_PREFIXES):
+            raise JourneyValidationError(
+                f"{where}: images must be image data URLs or http(s) URLs"
+            )
+    return tuple(value)
+
+
+def _parse_location(data, index):
+    where = f"locations[{index}]"
+    if not isinstance(data, dict):
+        raise JourneyValidationError(f"{where}: must be an object")
+    if "coordinates" not in data:
+        raise JourneyValidationError(f"{where}: coordinates are missing")
+
+    arrival = _parse_date(data.get("arrival"), where, "arrival")
+    departure = _parse_date(data.get("departure"), where, "departure")
+    if arrival and departure and departure < arrival:
+        raise JourneyValidationError(f"{where}: departure is before arrival")
+
+    return Location(
+        id=str(data.get("id") or ""),
+        address=str(data.get("address") or ""),
+        coordinates=_parse_coordinates(data["coordinates"], where),
+        arrival=arrival,
+        departure=departure,
+        images=_parse_images(data.get("images"), where),
+    )
+
+
+def parse_journey(data):
+    """
+    Parses and validates the map form data posted to `/bg`. Everything is checked
+    up front, so a bad request fails before a browser is launched for it.
+
+    Args:
+        data (dict): The map form data, with `tileSrc` and `locations`.
+
+    Returns:
+        Journey: The parsed journey, immutable and hashable.
+
+    Raises:
+        JourneyValidationError: With a message saying what is wrong and where.
+    """
+    if not isinstance(data, dict):
+        raise JourneyValidationError("map form data must be an object")
+
+    tile_src = data.get("tileSrc")
+    if tile_src not in TILE_SOURCES:
+        raise JourneyValidationError(f"tileSrc: unknown tile source {tile_src!r}")
+
+    raw_locations = data.get("locations")
+    if not raw_locations or not isinstance(raw_locations, list):
+        raise JourneyValidationError("locations: at least one location is required")
+    locations = tuple(
+        _parse_location(location, i) for i, location in enumerate(raw_locations)
+    )
+
+    # Each stop has to start after the previous one ended.
+    for i in range(1, len(locations)):
+        previous, current = locations[i - 1], locations[i]
+        left = previous.departure or previous.arrival
+        if left and current.arrival and current.arrival < left:
+            raise JourneyValidationError(
+                f"locations[{i}]: arrival is before leaving the previous location"
+            )
+
+    return Journey(tile_src=tile_src, locations=locations)
+
+
+def parse_products(data, specs):
+    """
+    Parses the optional `products` list posted to `/bg` alongside the journey.
+
+    Args:
+        data (dict): The map form data.
+        specs (dict): The known products, by name, e.g. `PRODUCT_SPECS`.
+
+    Returns:
+        tuple: The spec of every requested product, in order. Empty when no
+            products were asked for.
+
+    Raises:
+        JourneyValidationError: When `products` isn't a list of known names.
+    """
+    names = data.get("products") if isinstance(data, dict) else None
+    if names is None:
+        return ()
+    if not isinstance(names, list):
+        raise JourneyValidationError("products: must be a list of product names")
+    unknown = [name for name in names if not isinstance(name, str) or name not in specs]
+    if unknown:
+        raise JourneyValidationError(f"products: unknown products {unknown}")
+    return tuple(specs[name] for name in names)
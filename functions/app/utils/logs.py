@@ -0,0 +1,209 @@
+import atexit
+import contextvars
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", 200))
+LOG_FLUSH_INTERVAL = float(os.environ.get("LOG_FLUSH_INTERVAL", 0.5))
+LOG_FLUSH_TIMEOUT = float(os.environ.get("LOG_FLUSH_TIMEOUT", 2))
+BROWSER_LOG_RATE = float(os.environ.get("BROWSER_LOG_RATE", 20))
+BROWSER_LOG_BURST = int(os.environ.get("BROWSER_LOG_BURST", 50))
+
+LOG_FORMAT = (
+    "%(asctime)s %(levelname)s %(name)s "
+    "request=%(request_id)s job=%(job_id)s %(message)s"
+)
+
+request_id = contextvars.ContextVar("request_id", default="-")
+job_id = contextvars.ContextVar("job_id", default="-")
+
+_pipeline = None
+
+
+class ContextFilter(logging.Filter):
+    """
+    Tags records with the current request and job ids, unless they were passed
+    explicitly through `extra`. It sits on the queue handler, so it runs in the
+    thread that logged and sees that thread's context.
+    """
+
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        if not hasattr(record, "job_id"):
+            record.job_id = job_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket over the records of a logger. Lets `burst` records through at
+    once and `rate` per second after that, dropping the rest. The number dropped
+    is added to the next record that gets through.
+    """
+
+    def __init__(self, rate=BROWSER_LOG_RATE, burst=BROWSER_LOG_BURST):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._last) * self.rate
+            )
+            self._last = now
+            if self._tokens < 1:
+                self._dropped += 1
+                return False
+            self._tokens -= 1
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} messages suppressed)"
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the pipeline's queue without ever waiting on it. When the
+    queue is full the record is dropped and counted instead.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LogPipeline:
+    """
+    Background thread that drains the log queue and writes to the stream in
+    batches, either every `batch_size` records or every `flush_interval` seconds,
+    whichever comes first.
+    """
+
+    def __init__(
+        self,
+        stream=None,
+        queue_size=LOG_QUEUE_SIZE,
+        batch_size=LOG_BATCH_SIZE,
+        flush_interval=LOG_FLUSH_INTERVAL,
+    ):
+        self.stream = stream or sys.stdout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.formatter = logging.Formatter(LOG_FORMAT)
+        self.handler = NonBlockingQueueHandler(self.queue)
+        self.handler.addFilter(ContextFilter())
+        self._stop = object()
+        self._thread = threading.Thread(
+            target=self._run, name="log-pipeline", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Flushes everything queued so far and stops the thread."""
+        if self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join()
+
+    def flush(self, timeout=LOG_FLUSH_TIMEOUT):
+        """
+        Blocks until everything queued before the call has been written, or for at
+        most `timeout` seconds.
+
+        Returns:
+            bool: Whether everything was written in time.
+        """
+        if not self._thread.is_alive():
+            return True
+        written = threading.Event()
+        try:
+            self.queue.put(written, timeout=timeout)
+        except queue.Full:
+            return False
+        return written.wait(timeout)
+
+    def _write(self, batch):
+        if batch:
+            self.stream.write("".join(batch))
+            self.stream.flush()
+            batch.clear()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                record = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                record = None
+
+            if record is self._stop:
+                self._write(batch)
+                return
+            if isinstance(record, threading.Event):
+                # A `flush` waiting on everything queued before it.
+                self._write(batch)
+                record.set()
+                deadline = time.monotonic() + self.flush_interval
+                continue
+            if record is not None:
+                batch.append(self.formatter.format(record) + "\n")
+
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                deadline = time.monotonic() + self.flush_interval
+
+
+def setup_logging(level=LOG_LEVEL, stream=None):
+    """
+    Routes every log record through the queue backed pipeline. Safe to call more
+    than once, only the first call sets things up.
+
+    The pipeline replaces any handlers already on the root logger, such as the one
+    the Lambda runtime installs, so every line is written once.
+
+    Returns:
+        LogPipeline: The running pipeline.
+    """
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline(stream=stream)
+        _pipeline.start()
+        root = logging.getLogger()
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(_pipeline.handler)
+        root.setLevel(level)
+        atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def flush_logs(timeout=LOG_FLUSH_TIMEOUT):
+    """
+    Writes out everything logged so far. Lambda freezes the sandbox as soon as
+    the handler returns, so `FlaskLambda` calls this before returning.
+    """
+    if _pipeline is not None:
+        _pipeline.flush(timeout)
@@ -1,8 +1,13 @@
+import logging
 import os
 import random
 import requests
 from urllib.parse import quote
 
+MAPBOX_BASE_URL = os.environ.get("MAPBOX_BASE_URL", "https://api.mapbox.com")
+
+logger = logging.getLogger(__name__)
+
 
 def get_geocoded_suggestions(address):
     """
@@ -19,7 +24,7 @@ def get_geocoded_suggestions(address):
     """
     MAPBOX_API_KEY = os.environ.get("MAPBOX_API_KEY")
     address = quote(address)
-    url = f"https://api.mapbox.com/geocoding/v5/mapbox.places/{address}.json"
+    url = f"{MAPBOX_BASE_URL}/geocoding/v5/mapbox.places/{address}.json"
     params = {
         "access_token": MAPBOX_API_KEY,
         "types": "country,region,district,place,locality",
@@ -29,11 +34,11 @@ def get_geocoded_suggestions(address):
         if response.status_code == 200:
             return response.json().get("features")
         elif response.status_code == 429:
-            print("Rate limit exceeded. Please try again later.")
+            logger.warning("Rate limit exceeded. Please try again later.")
         else:
-            print(f"Error: {response.status_code} - {response.reason}")
+            logger.error("Error: %s - %s", response.status_code, response.reason)
     except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
+        logger.error("Request failed: %s", e)
 
     return None
 
@@ -1,8 +1,11 @@
+import logging
 import os
 import requests
 
 PRINTIFY_API_KEY = os.environ.get("PRINTIFY_API_KEY")
-PRINTIFY_BASE_URL = "https://api.printify.com/v1/"
+PRINTIFY_BASE_URL = os.environ.get("PRINTIFY_BASE_URL", "https://api.printify.com/v1/")
+
+logger = logging.getLogger(__name__)
 
 
 class Printify:
@@ -20,7 +23,9 @@ class Printify:
         if res.ok:
             return res.json()
         else:
-            print(f"Error fetching data from {url}: {res.status_code} {res.reason}")
+            logger.error(
+                "Error fetching data from %s: %s %s", url, res.status_code, res.reason
+            )
             return None
 
     @classmethod
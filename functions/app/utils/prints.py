@@ -0,0 +1,151 @@
+import hashlib
+import os
+import shutil
+from dataclasses import astuple, dataclass
+
+from PIL import Image, ImageOps
+
+from .workers import LazyProcessPool, atomic_path
+
+PRINTS_CACHE_DIR = os.environ.get("PRINTS_CACHE_DIR", "./prints")
+PRINTS_WORKERS = int(os.environ.get("PRINTS_WORKERS", 2))
+
+FORMAT_EXTENSIONS = {"PNG": "png", "JPEG": "jpg", "WEBP": "webp"}
+
+pool = LazyProcessPool(PRINTS_WORKERS)
+
+
+@dataclass(frozen=True, slots=True)
+class ProductSpec:
+    """
+    What a product's print file needs to look like. The master render is cropped
+    to the aspect ratio of `width` x `height` around its center, then resized.
+    """
+
+    name: str
+    width: int
+    height: int
+    dpi: int = 300
+    format: str = "PNG"
+    mode: str = "RGB"
+    quality: int = 95
+
+    @property
+    def key(self):
+        """Short, stable identifier of every field of the spec."""
+        return hashlib.sha256(repr(astuple(self)).encode()).hexdigest()[:16]
+
+
+# Print areas of the Printify blueprints we sell, in pixels at 300 DPI.
+PRODUCT_SPECS = {
+    spec.name: spec
+    for spec in (
+        ProductSpec("poster-18x24", 5400, 7200),
+        ProductSpec("poster-24x18", 7200, 5400),
+        ProductSpec("canvas-16x12", 4800, 3600, format="JPEG", quality=92),
+        ProductSpec("mug-11oz", 2475, 1155),
+        ProductSpec("postcard-6x4", 1800, 1200, format="JPEG"),
+        ProductSpec("preview", 1200, 900, dpi=72, format="WEBP", quality=80),
+    )
+}
+
+
+class PrintDerivationError(ValueError):
+    pass
+
+
+def hash_file(path, chunk_size=2**20):
+    """Returns the sha256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def store_master(path, cache_dir=PRINTS_CACHE_DIR):
+    """
+    Copies a master render into the cache under its content hash. Derivations read
+    from this copy, so the render's own file can be overwritten in the meantime.
+
+    Returns:
+        tuple: The master's hash and the path of the stored copy.
+    """
+    master_hash = hash_file(path)
+    masters_dir = os.path.join(cache_dir, "masters")
+    os.makedirs(masters_dir, exist_ok=True)
+    stored = os.path.join(masters_dir, master_hash + os.path.splitext(path)[1])
+    if not os.path.exists(stored):
+        shutil.copyfile(path, stored)
+    return master_hash, stored
+
+
+def derivative_path(master_hash, spec, cache_dir=PRINTS_CACHE_DIR):
+    extension = FORMAT_EXTENSIONS[spec.format]
+    return os.path.join(
+        cache_dir, master_hash[:16], f"{spec.name}-{spec.key}.{extension}"
+    )
+
+
+def derive(master_path, master_hash, spec, cache_dir=PRINTS_CACHE_DIR):
+    """
+    Generates one product's print file from the master render, unless it's
+    already cached for this master and spec.
+
+    Args:
+        master_path (str): Path of the master render.
+        master_hash (str): Hash of the master, from `store_master`.
+        spec (ProductSpec): The product to derive.
+        cache_dir (str): Root of the derivative cache.
+
+    Returns:
+        str: Path of the print file.
+    """
+    if spec.format not in FORMAT_EXTENSIONS:
+        raise PrintDerivationError(f"Unsupported format {spec.format}")
+
+    dest = derivative_path(master_hash, spec, cache_dir)
+    if os.path.exists(dest):
+        return dest
+
+    with Image.open(master_path) as master:
+        image = ImageOps.fit(
+            master, (spec.width, spec.height), method=Image.Resampling.LANCZOS
+        )
+    if image.mode != spec.mode:
+        image = image.convert(spec.mode)
+
+    options = {"dpi": (spec.dpi, spec.dpi)}
+    if spec.format in ("JPEG", "WEBP"):
+        options["quality"] = spec.quality
+    if spec.format == "PNG":
+        options["optimize"] = True
+
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    # Written next to its final name and moved into place, so a cache hit never
+    # returns a half written file.
+    with atomic_path(dest) as partial:
+        image.save(partial, format=spec.format, **options)
+    return dest
+
+
+def derive_products(master_path, specs, cache_dir=PRINTS_CACHE_DIR):
+    """
+    Derives print files for any number of products from a single master render,
+    in the background process pool.
+
+    Args:
+        master_path (str): Path of the master render.
+        specs (list): ProductSpec of every product to derive.
+        cache_dir (str): Root of the derivative cache.
+
+    Returns:
+        dict: Future resolving to the print file path, for each product name.
+    """
+    # The workers don't share the app's working directory.
+    cache_dir = os.path.abspath(cache_dir)
+    master_hash, stored = store_master(master_path, cache_dir)
+    return {
+        spec.name: pool.submit(derive, stored, master_hash, spec, cache_dir)
+        for spec in specs
+    }
@@ -0,0 +1,238 @@
+import contextvars
+import logging
+import os
+import shutil
+import subprocess  # nosec B404
+
+from .workers import LazyProcessPool, atomic_path
+
+TRANSCODE_CODEC = os.environ.get("TRANSCODE_CODEC", "libx264")
+TRANSCODE_BITRATE = os.environ.get("TRANSCODE_BITRATE", "4M")
+TRANSCODE_WIDTH = int(os.environ.get("TRANSCODE_WIDTH", 1920))
+TRANSCODE_EXTENSION = os.environ.get("TRANSCODE_EXTENSION", "mp4")
+TRANSCODE_WORKERS = int(os.environ.get("TRANSCODE_WORKERS", 2))
+
+POSTER_OFFSET_SECONDS = 1
+PREVIEW_WIDTH = 480
+PREVIEW_FPS = 12
+PREVIEW_SECONDS = 6
+PREVIEW_BITRATE = "500k"
+
+pool = LazyProcessPool(TRANSCODE_WORKERS)
+
+logger = logging.getLogger(__name__)
+
+
+class TranscodeError(RuntimeError):
+    pass
+
+
+def scale_filter(width):
+    """
+    Returns the ffmpeg filter that scales a video down to at most `width` pixels
+    wide. Narrower videos keep their size, upscaling only costs bitrate.
+    -2 keeps the height even, which H.264 with yuv420p requires.
+    """
+    return f"scale='min({width},iw)':-2"
+
+
+def build_transcode_command(
+    src, dest, codec=TRANSCODE_CODEC, bitrate=TRANSCODE_BITRATE, width=TRANSCODE_WIDTH
+):
+    """
+    Builds the ffmpeg command that re-encodes the captured animation.
+
+    Args:
+        src (str): Path to the WebM file saved from the browser.
+        dest (str): Path the encoded video is written to.
+        codec (str): ffmpeg video encoder, e.g. `libx264` or `libvpx-vp9`.
+        bitrate (str): Target video bitrate, e.g. `4M`.
+        width (int): Maximum output width in pixels, height keeps the aspect ratio.
+
+    Returns:
+        list: The command as a list of arguments for `subprocess.run`.
+    """
+    command = [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        src,
+        "-an",
+        "-c:v",
+        codec,
+        "-b:v",
+        bitrate,
+        "-vf",
+        scale_filter(width),
+        "-pix_fmt",
+        "yuv420p",
+    ]
+    if dest.endswith(".mp4"):
+        # Move the index to the front so the video can start playing before
+        # it has fully downloaded.
+        command += ["-movflags", "+faststart"]
+    return command + [dest]
+
+
+def build_poster_command(src, dest, width=TRANSCODE_WIDTH, at=POSTER_OFFSET_SECONDS):
+    """
+    Builds the ffmpeg command that grabs a single frame of the animation as a poster.
+
+    Args:
+        src (str): Path to the WebM file saved from the browser.
+        dest (str): Path of the poster image, the extension sets the format.
+        width (int): Maximum output width in pixels.
+        at (float): Offset in seconds of the frame to grab.
+
+    Returns:
+        list: The command as a list of arguments for `subprocess.run`.
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-ss",
+        str(at),
+        "-i",
+        src,
+        "-frames:v",
+        "1",
+        "-vf",
+        scale_filter(width),
+        dest,
+    ]
+
+
+def build_preview_command(
+    src,
+    dest,
+    width=PREVIEW_WIDTH,
+    fps=PREVIEW_FPS,
+    seconds=PREVIEW_SECONDS,
+    bitrate=PREVIEW_BITRATE,
+):
+    """
+    Builds the ffmpeg command for a short, small and low frame rate preview clip.
+
+    Args:
+        src (str): Path to the WebM file saved from the browser.
+        dest (str): Path the preview is written to.
+        width (int): Maximum output width in pixels.
+        fps (int): Output frame rate.
+        seconds (float): Length of the preview.
+        bitrate (str): Target video bitrate.
+
+    Returns:
+        list: The command as a list of arguments for `subprocess.run`.
+    """
+    return [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-i",
+        src,
+        "-t",
+        str(seconds),
+        "-an",
+        "-c:v",
+        "libx264",
+        "-b:v",
+        bitrate,
+        "-vf",
+        f"{scale_filter(width)},fps={fps}",
+        "-pix_fmt",
+        "yuv420p",
+        "-movflags",
+        "+faststart",
+        dest,
+    ]
+
+
+def _run(command, dest):
+    """
+    Runs an ffmpeg command. ffmpeg streams its output straight to disk, nothing
+    is held in memory here.
+
+    Args:
+        command (list): The command, from one of the builders above.
+        dest (str): The file the command produces, for the error message.
+
+    Raises:
+        TranscodeError: With ffmpeg's error output when the command fails.
+    """
+    result = subprocess.run(  # nosec B603
+        command,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    if result.returncode != 0:
+        error = result.stderr.decode("utf-8", errors="replace").strip()
+        raise TranscodeError(f"ffmpeg failed for {dest}: {error}")
+
+
+def process_animation(src, out_dir=None):
+    """
+    Transcodes a captured animation and derives a poster frame and a preview from it.
+    This is the function run inside the process pool, it blocks until all three
+    outputs are written.
+
+    Args:
+        src (str): Path to the WebM file saved from the browser.
+        out_dir (str): Directory for the outputs, defaults to the directory of `src`.
+
+    Returns:
+        dict: Paths of the `video`, `poster` and `preview` files.
+    """
+    if shutil.which("ffmpeg") is None:
+        raise TranscodeError("ffmpeg is not installed")
+
+    out_dir = out_dir or os.path.dirname(os.path.abspath(src))
+    name = os.path.splitext(os.path.basename(src))[0]
+    outputs = {
+        "video": os.path.join(out_dir, f"{name}.{TRANSCODE_EXTENSION}"),
+        "poster": os.path.join(out_dir, f"{name}-poster.jpg"),
+        "preview": os.path.join(out_dir, f"{name}-preview.mp4"),
+    }
+    builders = {
+        "video": build_transcode_command,
+        "poster": build_poster_command,
+        "preview": build_preview_command,
+    }
+    for kind, build in builders.items():
+        # Encoded into a temporary file and only moved into place once ffmpeg
+        # succeeded, so readers never see a partially written video.
+        with atomic_path(outputs[kind]) as partial:
+            _run(build(src, partial), outputs[kind])
+    return outputs
+
+
+def _report(future):
+    try:
+        logger.info("Transcode finished: %s", future.result())
+    except Exception as e:
+        logger.error("Transcode failed: %s", e)
+
+
+def submit_animation(src, out_dir=None):
+    """
+    Queues a captured animation for transcoding in the background process pool.
+    Returns immediately so the request doesn't wait on the encode.
+
+    Args:
+        src (str): Path to the WebM file saved from the browser.
+        out_dir (str): Directory for the outputs, defaults to the directory of `src`.
+
+    Returns:
+        concurrent.futures.Future: Resolves to the dict returned by `process_animation`.
+    """
+    future = pool.submit(process_animation, os.path.abspath(src), out_dir)
+    # Report with the request and job ids of the caller, not the pool's thread.
+    context = contextvars.copy_context()
+    future.add_done_callback(lambda f: context.run(_report, f))
+    return future
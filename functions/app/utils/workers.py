@@ -0,0 +1,66 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+
+class LazyProcessPool:
+    """
+    Process pool created on first use, so importing the app doesn't start any
+    processes.
+
+    Workers are spawned rather than forked. A forked worker inherits every open
+    file descriptor of the app, including the pipe to the Playwright driver of any
+    render still running, so the driver never sees EOF and that render's
+    `sync_playwright()` block never exits.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Submits a job to the pool, see `ProcessPoolExecutor.submit`."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            executor = self._executor
+        return executor.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True):
+        """
+        Shuts the pool down, by default after every queued job finished. The next
+        job starts a new pool.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+@contextmanager
+def atomic_path(dest):
+    """
+    Yields a temporary path next to `dest` to write to, and moves the file into
+    place once the block finished, so readers never see a partially written file.
+    Nothing is left behind when the block fails.
+
+    The temporary name is unique to the call, so jobs writing the same `dest` at
+    once don't write into each other's file. It keeps the extension, ffmpeg and
+    Pillow go by it.
+    """
+    base, ext = os.path.splitext(dest)
+    partial = f"{base}.{uuid.uuid4().hex[:12]}.part{ext}"
+    try:
+        yield partial
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    os.replace(partial, dest)
@@ -0,0 +1,325 @@
+"""
+Benchmarks of the app's hot paths against local stand-ins for its upstreams.
+
+    cd functions && python -m benchmarks [--update] [--only NAME] [--latency-ms N]
+
+Results are compared with the stored baseline and the run fails when a
+benchmark's median got slower than the baseline by more than the tolerance.
+`--update` records the current results as the new baseline instead. Baselines
+are machine specific, record one on the machine that runs the comparison.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import app as app_module
+from app.utils import camera, prints, transcode
+from app.utils.journey import parse_journey
+from app.utils.mapbox import get_geocoded_suggestions, suggestions
+from app.utils.pod import Printify
+
+from .stubs import start_upstreams, stop_upstreams
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_TOLERANCE = 0.25
+# Differences smaller than this are noise, whatever the percentage.
+MIN_REGRESSION_MS = 0.5
+
+BENCHMARKS = {}
+
+JOURNEY = {
+    "tileSrc": "osm_bright",
+    "locations": [
+        {
+            "id": f"address-{i}",
+            "address": place["place_name"],
+            "arrival": f"2024-01-{2 * i + 1:02d}",
+            "departure": f"2024-01-{2 * i + 2:02d}",
+            "coordinates": json.dumps(place["center"]),
+            "images": [],
+        }
+        for i, place in enumerate(suggestions[:6])
+    ],
+}
+
+
+class SkipBenchmark(Exception):
+    pass
+
+
+def benchmark(name, repeat=100, warmup=3):
+    """
+    Registers a benchmark. The decorated function is a context manager that
+    receives the running upstream stand-ins and yields the callable to time.
+    """
+
+    def register(setup):
+        BENCHMARKS[name] = SimpleNamespace(
+            name=name, setup=contextmanager(setup), repeat=repeat, warmup=warmup
+        )
+        return setup
+
+    return register
+
+
+def api_gateway_event(method, path, body=None):
+    """A minimal API Gateway proxy event, like the ones Lambda hands `FlaskLambda`."""
+    return {
+        "httpMethod": method,
+        "path": path,
+        "headers": {"Host": "localhost", "Content-Type": "application/json"},
+        "multiValueQueryStringParameters": None,
+        "body": json.dumps(body) if body is not None else None,
+        "requestContext": {"stage": "prod", "requestId": "bench"},
+    }
+
+
+LAMBDA_CONTEXT = SimpleNamespace(aws_request_id="bench")
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def serve_app():
+    """
+    Serves the app from a threaded werkzeug server on a random local port, in the
+    background. Call `shutdown()` on the returned server to stop it.
+    """
+    server = make_server(
+        "127.0.0.1",
+        0,
+        app_module.app,
+        threaded=True,
+        request_handler=QuietRequestHandler,
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@contextmanager
+def render_workdir():
+    """
+    Runs renders in a temporary working directory, which the renders and the
+    background transcode and print jobs write to. On the way out it waits for
+    those jobs to finish before removing the directory.
+    """
+    cwd, workdir = os.getcwd(), tempfile.mkdtemp()
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        transcode.pool.shutdown()
+        prints.pool.shutdown()
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@benchmark("mapbox.get_geocoded_suggestions", repeat=200)
+def geocoding(upstreams):
+    yield lambda: get_geocoded_suggestions("Tallinn")
+
+
+@benchmark("printify.get_shops", repeat=200)
+def printify_shops(upstreams):
+    yield Printify.get_shops
+
+
+@benchmark("printify.get_blueprints", repeat=200)
+def printify_blueprints(upstreams):
+    yield Printify.get_blueprints
+
+
+@benchmark("flasklambda.get_home", repeat=500)
+def lambda_home(upstreams):
+    event = api_gateway_event("GET", "/")
+    yield lambda: app_module.app(event, LAMBDA_CONTEXT)
+
+
+@benchmark("flasklambda.get_address_suggestions", repeat=200)
+def lambda_suggestions(upstreams):
+    event = api_gateway_event(
+        "POST", "/get-address-suggestions", {"address": "Tallinn"}
+    )
+    yield lambda: app_module.app(event, LAMBDA_CONTEXT)
+
+
+@benchmark("journey.parse_journey", repeat=2000)
+def journey_parse(upstreams):
+    yield lambda: parse_journey(JOURNEY)
+
+
+@benchmark("camera.plan_camera_path", repeat=200)
+def camera_plan(upstreams):
+    coordinates = parse_journey(JOURNEY).coordinates
+    # Time the computation, not the cache.
+    yield lambda: camera.plan_camera_path.__wrapped__(coordinates)
+
+
+@benchmark("render.bg", repeat=1, warmup=0)
+def render(upstreams):
+    static = os.path.join(os.path.dirname(app_module.__file__), "static", "main.js")
+    if not os.path.exists(static):
+        raise SkipBenchmark("client bundle not built, run build.sh")
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        if not os.path.exists(p.chromium.executable_path):
+            raise SkipBenchmark("chromium not installed, run `playwright install`")
+
+    server = serve_app()
+    url = f"http://127.0.0.1:{server.server_port}/bg"
+
+    def post():
+        response = requests.post(url, json=JOURNEY, timeout=600)
+        response.raise_for_status()
+
+    try:
+        with render_workdir():
+            yield post
+    finally:
+        server.shutdown()
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_benchmark(bench, upstreams, repeat_scale=1.0):
+    """
+    Times a benchmark.
+
+    Returns:
+        dict: Timings in milliseconds.
+
+    Raises:
+        SkipBenchmark: When the benchmark can't run here.
+    """
+    repeat = max(1, round(bench.repeat * repeat_scale))
+    with bench.setup(upstreams) as fn:
+        for _ in range(bench.warmup):
+            fn()
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - start) * 1000)
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "p95_ms": round(percentile(samples, 95), 4),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Returns a message for every benchmark whose median regressed against the baseline.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        limit = previous["median_ms"] * (1 + tolerance)
+        slower_by = result["median_ms"] - previous["median_ms"]
+        if result["median_ms"] > limit and slower_by > MIN_REGRESSION_MS:
+            regressions.append(
+                f"{name}: median {result['median_ms']:.3f}ms, "
+                f"baseline {previous['median_ms']:.3f}ms "
+                f"(+{slower_by / previous['median_ms']:.0%})"
+            )
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def save_baseline(path, results):
+    document = {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update", action="store_true", help="store as baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--only", help="run benchmarks whose name contains this")
+    parser.add_argument("--repeat-scale", type=float, default=1.0)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="also write this run's results here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    upstreams = start_upstreams(
+        latency=args.latency_ms / 1000, error_rate=args.error_rate
+    )
+    results = {}
+    try:
+        for name, bench in BENCHMARKS.items():
+            if args.only and args.only not in name:
+                continue
+            try:
+                results[name] = run_benchmark(bench, upstreams, args.repeat_scale)
+            except SkipBenchmark as e:
+                print(f"{name:45} skipped: {e}")
+                continue
+            result = results[name]
+            print(
+                f"{name:45} median {result['median_ms']:10.3f}ms "
+                f"p95 {result['p95_ms']:10.3f}ms  n={result['repeat']}"
+            )
+    finally:
+        stop_upstreams(upstreams)
+
+    if args.output:
+        save_baseline(args.output, results)
+
+    baseline = load_baseline(args.baseline)
+    if args.update or not baseline:
+        save_baseline(args.baseline, {**baseline, **results})
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,383 @@
+"""
+Load tests the app with simulated users against local upstream stand-ins.
+
+    cd functions && python -m benchmarks.load [--users 20] [--duration 20]
+
+Every scenario runs once over WSGI (a threaded werkzeug server, driven over HTTP)
+and once through the `FlaskLambda` event path (API Gateway events passed straight
+to the app), and reports throughput, p50/p95/p99 latency, error rate, peak RSS and
+how far RSS grew above where the scenario started. The app and the simulated users
+share this process, so RSS covers both, plus any Chromium or pool processes it
+started.
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import requests
+
+from app import app as app_module
+from app.utils.mapbox import suggestions
+
+from .bench import (
+    JOURNEY,
+    LAMBDA_CONTEXT,
+    api_gateway_event,
+    percentile,
+    render_workdir,
+    serve_app,
+)
+from .stubs import start_upstreams, stop_upstreams
+
+# The address input waits this long after the last key press before asking for
+# suggestions, see `handleAddressInput` in client/static/main.js.
+AUTOCOMPLETE_DEBOUNCE = 1.0
+ADDRESSES = [place["place_name"] for place in suggestions]
+
+SCENARIOS = {}
+
+
+def scenario(name, description):
+    def register(fn):
+        SCENARIOS[name] = SimpleNamespace(name=name, description=description, run=fn)
+        return fn
+
+    return register
+
+
+class WSGITransport:
+    """Sends requests over HTTP to the app served by a threaded werkzeug server."""
+
+    name = "wsgi"
+    supports_render = True
+
+    def __init__(self):
+        self.server = None
+        self.base_url = None
+        self._local = threading.local()
+
+    def start(self):
+        self.server = serve_app()
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def stop(self):
+        self.server.shutdown()
+
+    def request(self, method, path, body=None):
+        # One keep-alive session per simulated user, like a browser tab.
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        response = session.request(method, self.base_url + path, json=body, timeout=600)
+        return response.status_code
+
+
+class LambdaTransport:
+    """Calls `FlaskLambda.__call__` with API Gateway events, as Lambda would."""
+
+    name = "lambda"
+    # The map page the render browser opens is looked up from the request's host,
+    # which has no server behind it on this path, so `/bg` is only sent over WSGI.
+    supports_render = False
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def request(self, method, path, body=None):
+        response = app_module.app(api_gateway_event(method, path, body), LAMBDA_CONTEXT)
+        return response["statusCode"]
+
+
+TRANSPORTS = {"wsgi": WSGITransport, "lambda": LambdaTransport}
+
+
+class User:
+    """
+    One simulated visitor. Records how long every request took and whether it
+    failed, and sleeps between actions scaled by `think_scale`.
+    """
+
+    def __init__(self, transport, deadline, think_scale, rng, samples, render):
+        self.transport = transport
+        self.deadline = deadline
+        self.think_scale = think_scale
+        self.rng = rng
+        self.samples = samples
+        # Whether this user may start a full `/bg` render.
+        self.render = render
+
+    @property
+    def done(self):
+        return time.monotonic() >= self.deadline
+
+    def think(self, seconds):
+        time.sleep(
+            min(seconds * self.think_scale, max(0, self.deadline - time.monotonic()))
+        )
+
+    def request(self, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status = self.transport.request(method, path, body)
+            ok = status < 400
+        except Exception:
+            ok = False
+        self.samples.append((path, (time.perf_counter() - start) * 1000, ok))
+
+    def type_address(self):
+        """
+        Types an address in bursts. A request goes out whenever the typist pauses
+        longer than the debounce, so one address costs a few requests.
+        """
+        address = self.rng.choice(ADDRESSES)
+        typed = 0
+        while typed < len(address) and not self.done:
+            typed = min(len(address), typed + self.rng.randint(3, 8))
+            # Roughly 5 keys a second within a burst.
+            self.think(0.2 * self.rng.randint(3, 8))
+            self.think(AUTOCOMPLETE_DEBOUNCE)
+            self.request(
+                "POST", "/get-address-suggestions", {"address": address[:typed]}
+            )
+
+    def load_pages(self):
+        self.request("GET", "/")
+        self.request("GET", "/map")
+
+
+@scenario("autocomplete", "users typing addresses into the location inputs")
+def autocomplete(user):
+    while not user.done:
+        user.type_address()
+        user.think(user.rng.uniform(1, 3))
+
+
+@scenario("page_loads", "users opening the site")
+def page_loads(user):
+    while not user.done:
+        user.load_pages()
+        user.think(user.rng.uniform(2, 5))
+
+
+@scenario("mixed", "page loads, a journey of autocompletes and sometimes a render")
+def mixed(user):
+    while not user.done:
+        user.load_pages()
+        for _ in range(user.rng.randint(2, 4)):
+            user.type_address()
+        if user.render and user.rng.random() < 0.1:
+            user.request("POST", "/bg", JOURNEY)
+        user.think(user.rng.uniform(5, 10))
+
+
+def _process_tree(root_pid):
+    """Returns `root_pid` and the pids of all its descendants, read from /proc."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is in parentheses and may contain spaces.
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue  # Exited while we were looking.
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, ()))
+    return pids
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+class RSSSampler:
+    """
+    Samples the resident set size of this process and every process it started,
+    such as Chromium and the transcode and print pools, in the background. Keeps
+    the RSS at the start and the peak. Pages shared between processes are
+    counted once per process, so this overstates a little.
+    """
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.start_bytes = 0
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def current_bytes():
+        if os.path.isdir("/proc/self"):
+            return sum(_rss_bytes(pid) for pid in _process_tree(os.getpid()))
+        # Not on Linux, fall back to the peaks of this process and of its
+        # largest finished child (bytes on macOS).
+        peak = sum(
+            resource.getrusage(who).ru_maxrss
+            for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+        )
+        return peak if sys.platform == "darwin" else peak * 1024
+
+    @property
+    def growth_bytes(self):
+        return max(0, self.peak_bytes - self.start_bytes)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start_bytes = self.peak_bytes = self.current_bytes()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+
+
+def summarize(samples, elapsed, peak_rss_bytes, start_rss_bytes=0):
+    latencies = [latency for _, latency, _ in samples]
+    errors = sum(1 for _, _, ok in samples if not ok)
+    summary = {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "peak_rss_mb": round(peak_rss_bytes / 2**20, 1),
+        "peak_rss_growth_mb": round(
+            max(0, peak_rss_bytes - start_rss_bytes) / 2**20, 1
+        ),
+    }
+    for q in (50, 95, 99):
+        summary[f"p{q}_ms"] = round(percentile(latencies, q), 3) if latencies else None
+    return summary
+
+
+def run_scenario(scenario, transport, users, duration, think_scale, render, seed=0):
+    """
+    Runs `users` simulated users through a scenario for `duration` seconds.
+    `/bg` renders are only sent when `render` is set and the transport supports them.
+
+    Returns:
+        dict: The summary from `summarize`.
+    """
+    samples = []
+    render = render and transport.supports_render
+    deadline = time.monotonic() + duration
+    threads = []
+    for i in range(users):
+        rng = random.Random(seed + i)  # nosec B311
+        user = User(transport, deadline, think_scale, rng, samples, render)
+        threads.append(threading.Thread(target=scenario.run, args=(user,), daemon=True))
+
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    return summarize(samples, elapsed, rss.peak_bytes, rss.start_bytes)
+
+
+def render_available():
+    static = os.path.join(os.path.dirname(app_module.__file__), "static", "main.js")
+    if not os.path.exists(static):
+        return False
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        return os.path.exists(p.chromium.executable_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument(
+        "--think-scale",
+        type=float,
+        default=1.0,
+        help="multiplies every pause, below 1 compresses time for more load",
+    )
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS)
+    parser.add_argument("--transport", action="append", choices=TRANSPORTS)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write the results as JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    render = render_available()
+    if not render:
+        print("Renders not available here, /bg is left out of the mixed scenario")
+
+    upstreams = start_upstreams(
+        latency=args.latency_ms / 1000, error_rate=args.error_rate
+    )
+    results = {}
+    # Renders write to the working directory, keep that out of the caller's.
+    workdir = render_workdir() if render else contextlib.nullcontext()
+    try:
+        with workdir:
+            for transport_name in args.transport or TRANSPORTS:
+                transport = TRANSPORTS[transport_name]()
+                transport.start()
+                try:
+                    for scenario_name in args.scenario or SCENARIOS:
+                        summary = run_scenario(
+                            SCENARIOS[scenario_name],
+                            transport,
+                            args.users,
+                            args.duration,
+                            args.think_scale,
+                            render,
+                        )
+                        results[f"{scenario_name}.{transport_name}"] = summary
+                        print(
+                            f"{scenario_name + '.' + transport_name:24} "
+                            f"{summary['throughput_rps']:8.1f} req/s  "
+                            f"p50 {summary['p50_ms']}ms  p95 {summary['p95_ms']}ms  "
+                            f"p99 {summary['p99_ms']}ms  "
+                            f"errors {summary['error_rate']:.1%}  "
+                            f"peak RSS {summary['peak_rss_mb']}MB "
+                            f"(+{summary['peak_rss_growth_mb']}MB)"
+                        )
+                finally:
+                    transport.stop()
+    finally:
+        stop_upstreams(upstreams)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Local stand-ins for the upstream services the app talks to, so benchmarks and
+load tests don't depend on (or get rate limited by) the real ones.
+"""
+import io
+import json
+import random
+import re
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+from app.utils.mapbox import suggestions
+
+
+def _tile_png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (256, 256), (170, 211, 223)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+TILE_PNG = _tile_png()
+
+# Settings replaced by `start_upstreams`, to put back on `stop_upstreams`.
+_originals = {}
+
+
+def mapbox_routes(path):
+    """Geocoding: answers every query with a few of the canned suggestions."""
+    match = re.match(r"^/geocoding/v5/mapbox\.places/([^/]+)\.json", path)
+    if match:
+        return "application/json", json.dumps({"features": suggestions[:5]})
+    return None
+
+
+def printify_routes(path):
+    if path.startswith("/v1/shops.json"):
+        return "application/json", json.dumps([{"id": 1, "title": "Journeys"}])
+    if path.startswith("/v1/catalog/blueprints.json"):
+        blueprints = [
+            {"id": i, "title": f"Blueprint {i}", "brand": "Stub", "images": []}
+            for i in range(50)
+        ]
+        return "application/json", json.dumps(blueprints)
+    return None
+
+
+def tile_routes(path):
+    if re.match(r"^/tiles/\d+/\d+/\d+\.png", path):
+        return "image/png", TILE_PNG
+    return None
+
+
+class StubServer:
+    """
+    HTTP server on a random local port, run on a background thread.
+
+    Args:
+        routes (callable): Takes the request path and returns a
+            `(content_type, body)` tuple, or None for a 404.
+        latency (float): Seconds every response is delayed by.
+        error_rate (float): Share of requests, 0 to 1, answered with `error_status`.
+        error_status (int): Status code of injected errors.
+        seed (int): Seed for picking which requests fail, for repeatable runs.
+    """
+
+    def __init__(
+        self,
+        routes,
+        latency=0.0,
+        error_rate=0.0,
+        error_status=HTTPStatus.INTERNAL_SERVER_ERROR,
+        seed=0,
+    ):
+        self.routes = routes
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.requests = 0
+        self._random = random.Random(seed)  # nosec B311
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _should_fail(self):
+        with self._lock:
+            self.requests += 1
+            return self._random.random() < self.error_rate
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if stub._should_fail():
+                    return self._send(stub.error_status, "text/plain", b"injected")
+                route = stub.routes(self.path)
+                if route is None:
+                    return self._send(HTTPStatus.NOT_FOUND, "text/plain", b"")
+                content_type, body = route
+                if isinstance(body, str):
+                    body = body.encode("utf-8")
+                self._send(HTTPStatus.OK, content_type, body)
+
+            def _send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def start_upstreams(latency=0.0, error_rate=0.0, seed=0):
+    """
+    Starts stand-ins for Mapbox, Printify and the tile source, and points the
+    app at them until `stop_upstreams` is called.
+
+    Returns:
+        dict: The running `StubServer` for `mapbox`, `printify` and `tiles`.
+    """
+    from app import app as app_module
+    from app.utils import mapbox
+    from app.utils.pod import Printify
+
+    options = {"latency": latency, "error_rate": error_rate, "seed": seed}
+    servers = {
+        "mapbox": StubServer(mapbox_routes, **options).start(),
+        "printify": StubServer(printify_routes, **options).start(),
+        "tiles": StubServer(tile_routes, **options).start(),
+    }
+    _originals[id(servers)] = (
+        mapbox.MAPBOX_BASE_URL,
+        Printify.base_url,
+        Printify.api_key,
+        app_module.TILE_URL,
+    )
+    mapbox.MAPBOX_BASE_URL = servers["mapbox"].url
+    Printify.base_url = servers["printify"].url + "/v1/"
+    Printify.api_key = Printify.api_key or "stub"
+    app_module.TILE_URL = servers["tiles"].url + "/tiles/{z}/{x}/{y}.png"
+    return servers
+
+
+def stop_upstreams(servers):
+    """Stops the stand-ins and points the app back where it was."""
+    from app import app as app_module
+    from app.utils import mapbox
+    from app.utils.pod import Printify
+
+    for server in servers.values():
+        server.stop()
+    (
+        mapbox.MAPBOX_BASE_URL,
+        Printify.base_url,
+        Printify.api_key,
+        app_module.TILE_URL,
+    ) = _originals.pop(id(servers))